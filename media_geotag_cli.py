@@ -0,0 +1,315 @@
+## Media GeoTag Mapper Command-Line Interface:
+# Allows the functions within media_geotag_functions_v6.py to be run
+# from a terminal (or a cron job) rather than a Jupyter Notebook.
+
+# By Kenneth Burchfiel
+
+# Released under the MIT License
+
+# GitHub link:
+# https://github.com/kburchfiel/media_geotag_mapper
+
+# Example usage:
+# python media_geotag_cli.py scan combined '/media/kjb3/KJB320TB1/D1V1'
+# python media_geotag_cli.py extract combined
+# (or, for drives with corrupt files or stalling reads:)
+# python media_geotag_cli.py extract combined --pic-timeout 30 --clip-timeout 60
+# (or, for spinning external hard drives:)
+# python media_geotag_cli.py extract combined --schedule locality
+# python media_geotag_cli.py shard combined 0 4 '/media/kjb3/KJB320TB1/D1V1'
+# (run shards 1-3 elsewhere, copy their output here, then:)
+# python media_geotag_cli.py merge combined
+# python media_geotag_cli.py map combined combined_routes --add-paths
+# python media_geotag_cli.py map combined combined_by_year --add-paths --layer-period year
+# python media_geotag_cli.py screenshot "$PWD/maps" --save-path map_screenshots
+# python media_geotag_cli.py stats combined
+
+# Run 'python media_geotag_cli.py <subcommand> --help' to see all of the
+# options for a given subcommand.
+
+# This file only imports the standard library at startup.
+# media_geotag_functions_v6 (which in turn imports its heavier
+# dependencies only within the functions that need them) is imported once
+# a subcommand has been chosen, so running '--help' or a scan doesn't
+# require loading Selenium, Folium, etc.
+
+import argparse
+import os
+import sys
+
+
+def scan(args):
+    '''Generates a media list for the folders passed to the 'scan'
+    subcommand.'''
+    from media_geotag_functions_v6 import generate_media_list
+    df_media = generate_media_list(top_folder_list = args.top_folders,
+    folder_name = args.folder_name, files_to_import = args.files_to_import)
+    print(f"Found {len(df_media)} files; saved list to \
+{args.folder_name}_media_list.csv.")
+
+
+def extract(args):
+    '''Retrieves geotags for all files within an existing media list.'''
+    import pandas as pd
+    from media_geotag_functions_v6 import generate_loc_list, \
+        ExtractionGuard, ThumbnailStore
+    df_media = pd.read_csv(f'{args.folder_name}_media_list.csv')
+    thumbnail_store = (ThumbnailStore(f'{args.folder_name}_thumbnails')
+    if args.thumbnails == True else None)
+    if args.pic_timeout is None and args.clip_timeout is None:
+        df_locations = generate_loc_list(df_media = df_media,
+        folder_name = args.folder_name, thumbnail_store = thumbnail_store,
+        use_sidecars = args.use_sidecars, schedule = args.schedule,
+        locality_method = args.locality_method)
+    else:
+        # Passing either timeout enables the extraction guard; the other
+        # media type then uses ExtractionGuard's default budget.
+        guard_kwargs = {key: value for key, value in [
+            ('pic_timeout', args.pic_timeout), 
+            ('clip_timeout', args.clip_timeout)] if value is not None}
+        with ExtractionGuard(f'{args.folder_name}_quarantine.json',
+        max_retries = args.max_retries, 
+        quarantine_mode = args.quarantine_mode, 
+        **guard_kwargs) as extraction_guard:
+            df_locations = generate_loc_list(df_media = df_media,
+            folder_name = args.folder_name, 
+            extraction_guard = extraction_guard, 
+            thumbnail_store = thumbnail_store, 
+            use_sidecars = args.use_sidecars, schedule = args.schedule,
+            locality_method = args.locality_method)
+            print(extraction_guard.summary())
+    print(f"Saved {len(df_locations)} rows to \
+{args.folder_name}_media_locations.csv.")
+
+
+def shard(args):
+    '''Scans and extracts a single shard of the folders passed to the
+    'shard' subcommand.'''
+    from media_geotag_functions_v6 import run_extraction_shard
+    manifest = run_extraction_shard(args.top_folders, args.folder_name,
+    args.shard_index, args.shard_count, shard_by = args.shard_by,
+    files_to_import = args.files_to_import)
+    print(f"Shard {args.shard_index} of {args.shard_count}: found \
+{manifest['file_count']} files and {manifest['location_count']} \
+pictures/clips.")
+
+
+def merge(args):
+    '''Merges the output of all shards into a single media list and
+    location list.'''
+    from media_geotag_functions_v6 import merge_extraction_shards
+    merge_extraction_shards(args.folder_name, shard_folder = args.shard_folder)
+
+
+def create_map(args):
+    '''Creates an HTML map (or, if --static is passed, a static image)
+    from an existing location list.'''
+    from media_geotag_functions_v6 import load_location_list, \
+        MediaLocationIndex, map_media_locations, render_static_map, \
+        ThumbnailStore
+    location_index = MediaLocationIndex(load_location_list(
+        args.folder_name))
+    if args.bounding_box is not None:
+        south, north, west, east = args.bounding_box
+        df_locations = location_index.bounding_box(south, north, west, east,
+        start = args.start, end = args.end)
+        df_locations = df_locations[
+            df_locations['utc_metadata_creation_time'].notna()]
+    else:
+        df_locations = location_index.time_range(args.start, args.end)
+    starting_location = args.starting_location
+    if args.static == True:
+        render_static_map(df_locations, file_name = args.file_name,
+        folder_path = args.folder_path, add_paths = args.add_paths,
+        starting_location = starting_location, zoom_start = args.zoom_start,
+        color_points_by = args.color_points_by,
+        image_format = args.image_format)
+    else:
+        map_media_locations(df_locations, file_name = args.file_name,
+        folder_path = args.folder_path, add_paths = args.add_paths,
+        starting_location = (starting_location if starting_location
+        is not None else [39, -95]),
+        zoom_start = (args.zoom_start if args.zoom_start is not None
+        else 4), color_points_by = args.color_points_by,
+        thumbnail_store = (ThumbnailStore(f'{args.folder_name}_thumbnails')
+        if args.thumbnails == True else None),
+        layer_period = args.layer_period, 
+        initial_layers = args.initial_layers)
+
+
+def screenshot(args):
+    '''Takes screenshots of one map (if --map-name is passed) or of all
+    maps within a folder.'''
+    from media_geotag_functions_v6 import create_map_screenshot, \
+        batch_create_map_screenshots
+    path_to_map_folder = os.path.abspath(args.path_to_map_folder)
+    if args.map_name is not None:
+        create_map_screenshot(path_to_map_folder, map_name = args.map_name,
+        screenshot_save_path = args.save_path,
+        window_width = args.window_width)
+    else:
+        batch_create_map_screenshots(path_to_map_folder,
+        screenshot_save_path = args.save_path,
+        window_width = args.window_width)
+
+
+def stats(args):
+    '''Prints the number of geotags and the estimated distance traveled
+    for each year within a location list.'''
+    from media_geotag_functions_v6 import load_location_list, \
+        MediaLocationIndex, calculate_distance_by_year
+    df_locations = MediaLocationIndex(load_location_list(
+        args.folder_name)).time_range()
+    df_stats_by_year = calculate_distance_by_year(df_locations,
+    unit = args.unit)
+    print(df_stats_by_year.to_string(index = False))
+    print(f"Total distance: {df_stats_by_year['total_distance'].sum():,.0f} \
+{args.unit}")
+
+
+def watch(args):
+    '''Watches a set of folders and updates the location list and maps
+    as new media arrives.'''
+    from media_geotag_functions_v6 import watch_media_folders
+    watch_media_folders(args.top_folders, args.folder_name,
+    args.path_to_map_folder, screenshot_save_path = args.save_path,
+    use_inotify = not args.poll, poll_interval = args.poll_interval,
+    debounce_seconds = args.debounce_seconds)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description = 'Retrieve, store, and \
+map the geotags within your photos and videos.')
+    subparsers = parser.add_subparsers(dest = 'subcommand', required = True)
+
+    scan_parser = subparsers.add_parser('scan', help = 'List the files \
+within one or more folders (generate_media_list).')
+    scan_parser.add_argument('folder_name', help = 'The prefix to use for \
+output files (e.g. combined -> combined_media_list.csv).')
+    scan_parser.add_argument('top_folders', nargs = '+')
+    scan_parser.add_argument('--files-to-import', type = int, default = 0,
+    help = 'The number of files to read from each folder (0 = all).')
+    scan_parser.set_defaults(function = scan)
+
+    extract_parser = subparsers.add_parser('extract', help = 'Retrieve \
+geotags for the files within a media list (generate_loc_list).')
+    extract_parser.add_argument('folder_name')
+    extract_parser.add_argument('--pic-timeout', type = float, default = None,
+    help = 'The number of seconds to allow for each picture. Passing this \
+(or --clip-timeout) skips files that hang and records them within \
+<folder_name>_quarantine.json.')
+    extract_parser.add_argument('--clip-timeout', type = float, 
+    default = None)
+    extract_parser.add_argument('--max-retries', type = int, default = 1)
+    extract_parser.add_argument('--quarantine-mode', default = 'last',
+    choices = ['last', 'skip', 'retry'], help = 'How to handle files \
+quarantined during earlier runs.')
+    extract_parser.add_argument('--use-sidecars', action = 'store_true',
+    help = 'Read locations from JSON (e.g. Google Takeout) and XMP sidecars \
+where available, and only open media files without one.')
+    extract_parser.add_argument('--schedule', default = 'dataframe',
+    choices = ['dataframe', 'locality'], help = "'locality' reads pictures \
+and clips together in on-disk order, which reduces seeking on spinning \
+drives.")
+    extract_parser.add_argument('--locality-method', default = 'auto',
+    choices = ['auto', 'extent', 'inode', 'directory'])
+    extract_parser.add_argument('--thumbnails', action = 'store_true',
+    help = 'Also save embedded thumbnails and clip poster frames to \
+<folder_name>_thumbnails.')
+    extract_parser.set_defaults(function = extract)
+
+    shard_parser = subparsers.add_parser('shard', help = 'Scan and extract \
+one shard of a set of folders (run_extraction_shard).')
+    shard_parser.add_argument('folder_name')
+    shard_parser.add_argument('shard_index', type = int)
+    shard_parser.add_argument('shard_count', type = int)
+    shard_parser.add_argument('top_folders', nargs = '+')
+    shard_parser.add_argument('--shard-by', default = 'directory',
+    choices = ['directory', 'top_folder'])
+    shard_parser.add_argument('--files-to-import', type = int, default = 0)
+    shard_parser.set_defaults(function = shard)
+
+    merge_parser = subparsers.add_parser('merge', help = 'Merge the output \
+of all shards (merge_extraction_shards).')
+    merge_parser.add_argument('folder_name')
+    merge_parser.add_argument('--shard-folder', default = '.',
+    help = 'The folder containing the shard output files.')
+    merge_parser.set_defaults(function = merge)
+
+    map_parser = subparsers.add_parser('map', help = 'Map the geotags \
+within a location list (map_media_locations or render_static_map).')
+    map_parser.add_argument('folder_name')
+    map_parser.add_argument('file_name', help = "The map's name (without \
+'_locations.html').")
+    map_parser.add_argument('--folder-path', default = None,
+    help = 'The folder in which to save the map.')
+    map_parser.add_argument('--add-paths', action = 'store_true')
+    map_parser.add_argument('--start', default = None, help = 'Only map \
+geotags created at or after this UTC time (e.g. 2022-03-01).')
+    map_parser.add_argument('--end', default = None, help = 'Only map \
+geotags created before this UTC time.')
+    map_parser.add_argument('--bounding-box', type = float, nargs = 4,
+    default = None, metavar = ('SOUTH', 'NORTH', 'WEST', 'EAST'))
+    map_parser.add_argument('--starting-location', type = float, nargs = 2,
+    default = None, metavar = ('LAT', 'LON'))
+    map_parser.add_argument('--zoom-start', type = int, default = None)
+    map_parser.add_argument('--color-points-by', default = 'year_20xx',
+    choices = ['year', 'year_20xx', 'month', 'order', 'same'])
+    map_parser.add_argument('--static', action = 'store_true',
+    help = 'Render a static image instead of an HTML map.')
+    map_parser.add_argument('--image-format', default = 'png',
+    choices = ['png', 'jpg'])
+    map_parser.add_argument('--layer-period', default = None,
+    choices = ['year', 'month'], help = 'Split the map into yearly or \
+monthly layers that load on demand (HTML maps only).')
+    map_parser.add_argument('--initial-layers', nargs = '+', default = None,
+    help = 'The layers to show when the map opens (e.g. 2024 2025). \
+Defaults to the most recent layer.')
+    map_parser.add_argument('--thumbnails', action = 'store_true',
+    help = 'Show thumbnails from <folder_name>_thumbnails within popups \
+(HTML maps only).')
+    map_parser.set_defaults(function = create_map)
+
+    screenshot_parser = subparsers.add_parser('screenshot', help = 'Save \
+screenshots of HTML maps via Selenium (create_map_screenshot).')
+    screenshot_parser.add_argument('path_to_map_folder')
+    screenshot_parser.add_argument('--map-name', default = None,
+    help = 'The map to capture (e.g. combined_locations.html). If omitted, \
+all maps within the folder will be captured.')
+    screenshot_parser.add_argument('--save-path', default = None)
+    screenshot_parser.add_argument('--window-width', type = int,
+    default = 3840)
+    screenshot_parser.set_defaults(function = screenshot)
+
+    stats_parser = subparsers.add_parser('stats', help = 'Show geotag \
+counts and distances by year (calculate_distance_by_year).')
+    stats_parser.add_argument('folder_name')
+    stats_parser.add_argument('--unit', default = 'miles',
+    choices = ['miles', 'kilometers'])
+    stats_parser.set_defaults(function = stats)
+
+    watch_parser = subparsers.add_parser('watch', help = 'Update the \
+location list and maps as new files arrive (watch_media_folders).')
+    watch_parser.add_argument('folder_name')
+    watch_parser.add_argument('path_to_map_folder')
+    watch_parser.add_argument('top_folders', nargs = '+')
+    watch_parser.add_argument('--save-path', default = None,
+    help = 'The folder in which to save updated screenshots.')
+    watch_parser.add_argument('--poll', action = 'store_true',
+    help = 'Poll for changes instead of using inotify (e.g. for network \
+mounts).')
+    watch_parser.add_argument('--poll-interval', type = float, default = 30)
+    watch_parser.add_argument('--debounce-seconds', type = float,
+    default = 60)
+    watch_parser.set_defaults(function = watch)
+
+    return parser
+
+
+def main(argv = None):
+    args = build_parser().parse_args(argv)
+    args.function(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
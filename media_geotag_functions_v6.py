@@ -12,27 +12,129 @@
 # To see many of these functions in action, look through
 # the media_geotag_mapper_tutorial and media_geotag_mapper_iPhone_example Jupyter Notebooks. 
 
-import exifread # Installed via 'pip install exifread'. See
-# https://github.com/ianare/exif-py
 from os.path import join
 import time
-from branca.colormap import LinearColormap # See
-# https://python-visualization.github.io/branca/colormap.html#branca.colormap.LinearColormap
-from pyproj import Geod
 import numpy as np
-import ffmpeg # Installed via 'pip install python-ffmpeg'. See
-# https://github.com/kkroening/ffmpeg-python 
-from tqdm import tqdm
 import os
+import io
+import re
+import struct
+import functools
+import hashlib
+import json
+import glob
+import socket
+import urllib.request
 import pandas as pd
-import folium
-from haversine import haversine, Unit
 import datetime
-from selenium import webdriver
-import PIL.Image
+# Heavier dependencies (exifread, ffmpeg-python, branca, pyproj, folium,
+# haversine, selenium, Pillow, and tqdm) are imported within the 
+# functions that use them. This way, scripts and worker processes that
+# only need part of this file (e.g. scanning folders or extracting 
+# geotags) start up faster and use less memory.
+
+def retrieve_file_info(root, file):
+    '''Returns a dictionary containing the path, name, file system 
+    timestamps, size, extension, and type ('pic', 'clip', 'sidecar', or 
+    'other') of
+    a single file. root is the folder containing the file, and file is
+    the file's name. This function is called by generate_media_list for 
+    each file that it finds.'''
+    path = join(root, file)
+    file_stats = os.stat(path)
+    # See https://docs.python.org/3/library/os.html#os.stat
+    # for documentation on the following attributes.
+    ctime = file_stats.st_ctime
+    # st_ctime, st_mtime, and st_atime are all represented in seconds since
+    # the start of the Unix epoch. Therefore, time.ctime is used to convert
+    # these values to human-interpretable times.
+    mtime = file_stats.st_mtime
+    # I found that st_mtime (which represents the date that a file
+    # was modified) was a more accurate representation of a file's creation
+    # date than st_ctime. However, it had some notable inaccuracies
+    # as well on at least one date; therefore, I updated this file
+    # to add in metadata-based file creation times.
+    atime = file_stats.st_atime
+    megabytes = file_stats.st_size/1000000
+    # st_size represents the size of the file in bytes,
+    # so I divide that value by 1 million here in order 
+    # to retrieve the size in megabytes.
+
+    utc_ctime_estimate = pd.to_datetime(ctime, unit = 's', utc=True)
+    # st_ctime, whose values are stored within ctime_list, 
+    # refers to the creation time on Windows, whereas
+    # on Unix, this refers to "the time of most recent
+    # metadata change." However, I found on Windows that st_mtime was a 
+    # better representation of the time a video/image was originally captured
+    # than was st_ctime.
+    # (Source:
+    # https://docs.python.org/3/library/os.html#os.stat)
+    utc_modified_time_estimate = pd.to_datetime(
+        mtime, unit = 's', utc=True)
+    utc_accessed_time_estimate = pd.to_datetime(atime, unit = 's', 
+                                               utc=True)
+
+    extension = file.split('.')[-1].lower()
+    # The above line assumes that the last entry within the list created
+    # by splitting the 'name' value by peridos will be the file extension.
+    # This code should still work if there are periods in the file name
+    # (although I try to avoid that practice).
+
+    # Depending on your device type, you wil probably need to update 
+    # the following lists to include alternate video and image file types.
+
+    clip_extensions = ['mp4', 'mov', 'mts']
+    pic_extensions = ['jpg', 'tiff', 'png', 'jpeg', 'heic']
+    # JSON and XMP files may be sidecars (e.g. from Google Takeout or
+    # Lightroom) that store the geotags of the media files next to them.
+    # (See retrieve_sidecar_locations.)
+    sidecar_extensions = ['json', 'xmp']
+    # The following use of if/else within a lambda function is based on
+    # an example by Professor Hardeep Johar.
+
+    if extension in clip_extensions:
+        file_type = 'clip'
+    elif extension in pic_extensions:
+        file_type = 'pic'
+    elif extension in sidecar_extensions:
+        file_type = 'sidecar'
+    else:
+        file_type = 'other'
+    
+    return {'path':path, 'name':file, 'utc_ctime_estimate':utc_ctime_estimate,
+        'utc_modified_time_estimate':utc_modified_time_estimate,
+        'utc_accessed_time_estimate':utc_accessed_time_estimate,
+        'megabytes':megabytes, 'extension':extension,
+        'type':file_type}
+
+
+def assign_shard(top_folder_index, top_folder, root, shard_count, 
+shard_by = 'directory'):
+    '''Returns the shard (from 0 to shard_count - 1) to which the files
+    within the folder 'root' belong. 
+
+    If shard_by is 'directory', the shard is based on a hash of the
+    folder's position within top_folder_list and its path relative to 
+    top_folder. (Python's built-in hash() function isn't used here because
+    its output changes from one process to the next.) Because the full 
+    path isn't used, the same folder will be assigned to the same shard 
+    even if the drive is mounted at a different location on another
+    computer.
+
+    If shard_by is 'top_folder', each entry within top_folder_list 
+    (along with all of its subfolders) will be assigned to a single shard.
+    '''
+    if shard_by == 'top_folder':
+        return top_folder_index % shard_count
+    relative_root = os.path.relpath(root, top_folder).replace('\\', '/')
+    shard_key = f'{top_folder_index}:{relative_root}'
+    return int(hashlib.sha1(shard_key.encode('utf-8')).hexdigest(), 
+    16) % shard_count
+
 
 def generate_media_list(top_folder_list, folder_name, 
-                        files_to_import = 0):
+                        files_to_import = 0, shard_index = None,
+                        shard_count = None, shard_by = 'directory'):
     '''This function goes through all folders contained
     within top_folder_list, then generates a DataFrame with information 
     on the files that it finds within those folders.
@@ -41,6 +143,16 @@ def generate_media_list(top_folder_list, folder_name,
     subfolders) that you would like to process. Set to 0 to import
     all files; set to a positive integer to import only that number
     of files (which can be useful for debugging and testing work).
+    (Folders and files are visited in sorted order, so the same files
+    will be chosen each time.)
+
+    shard_index, shard_count, and shard_by: If shard_count is provided,
+    only the files within folders assigned to shard number shard_index 
+    (see assign_shard) will be included. The DataFrame's index will still
+    reflect each file's position within the full (unsharded) list, and
+    the list will be saved with a 'media_order' column containing these
+    positions so that merge_extraction_shards can recreate the full list.
+    See run_extraction_shard for more details.
 
     Note: if you receive an AttributeError message that states: 
     'Can only use .str accessor with string values!', 
@@ -53,89 +165,162 @@ def generate_media_list(top_folder_list, folder_name,
     slower, but perhaps more reliable, approach.'''
 
     media_dict_list = []
-    for top_folder in top_folder_list:
+    media_order_list = []
+    media_order = 0 # The position of the current file within the full list
+    for top_folder_index, top_folder in enumerate(top_folder_list):
         for root, dirs, files in os.walk(top_folder): 
+            # The order in which os.walk returns folders and files
+            # depends on the file system (and can differ from one computer
+            # to the next), so both are sorted here. This keeps each 
+            # file's media_order value the same on every computer that
+            # runs a shard. (Sorting dirs in place also determines the 
+            # order in which os.walk visits the subfolders.)
+            dirs.sort()
+            files = sorted(files)
             if files_to_import > 0:
                 # Limiting the number of files within each subfolder
                 # that the program will read (if requested by 
                 # the caller):
                 files = files[0:int(files_to_import)].copy()
+            in_shard = (shard_count is None) or (assign_shard(
+                top_folder_index, top_folder, root, shard_count, 
+                shard_by) == shard_index)
             for file in files: 
                 # You can add [0:10] to files to speed
                 # up this function while debugging your code
                 # This code is based on:
                 # https://docs.python.org/3/library/os.html
-                path = join(root, file)
-                file_stats = os.stat(path)
-                # See https://docs.python.org/3/library/os.html#os.stat
-                # for documentation on the following attributes.
-                ctime = file_stats.st_ctime
-                # st_ctime, st_mtime, and st_atime are all represented in seconds since
-                # the start of the Unix epoch. Therefore, time.ctime is used to convert
-                # these values to human-interpretable times.
-                mtime = file_stats.st_mtime
-                # I found that st_mtime (which represents the date that a file
-                # was modified) was a more accurate representation of a file's creation
-                # date than st_ctime. However, it had some notable inaccuracies
-                # as well on at least one date; therefore, I updated this file
-                # to add in metadata-based file creation times.
-                atime = file_stats.st_atime
-                megabytes = file_stats.st_size/1000000
-                # st_size represents the size of the file in bytes,
-                # so I divide that value by 1 million here in order 
-                # to retrieve the size in megabytes.
-
-                utc_ctime_estimate = pd.to_datetime(ctime, unit = 's', utc=True)
-                # st_ctime, whose values are stored within ctime_list, 
-                # refers to the creation time on Windows, whereas
-                # on Unix, this refers to "the time of most recent
-                # metadata change." However, I found on Windows that st_mtime was a 
-                # better representation of the time a video/image was originally captured
-                # than was st_ctime.
-                # (Source:
-                # https://docs.python.org/3/library/os.html#os.stat)
-                utc_modified_time_estimate = pd.to_datetime(
-                    mtime, unit = 's', utc=True)
-                utc_accessed_time_estimate = pd.to_datetime(atime, unit = 's', 
-                                                           utc=True)
-            
-                extension = file.split('.')[-1].lower()
-                # The above line assumes that the last entry within the list created
-                # by splitting the 'name' value by peridos will be the file extension.
-                # This code should still work if there are periods in the file name
-                # (although I try to avoid that practice).
-            
-                # Depending on your device type, you wil probably need to update 
-                # the following lists to include alternate video and image file types.
-            
-                clip_extensions = ['mp4', 'mov', 'mts']
-                pic_extensions = ['jpg', 'tiff', 'png', 'jpeg', 'heic']
-                # The following use of if/else within a lambda function is based on
-                # an example by Professor Hardeep Johar.
-
-                if extension in clip_extensions:
-                    file_type = 'clip'
-                elif extension in pic_extensions:
-                    file_type = 'pic'
-                else:
-                    file_type = 'other'
-                
-                media_dict_list.append(
-                    {'path':path, 'name':file, 'utc_ctime_estimate':utc_ctime_estimate,
-                    'utc_modified_time_estimate':utc_modified_time_estimate,
-                    'utc_accessed_time_estimate':utc_accessed_time_estimate,
-                    'megabytes':megabytes, 'extension':extension,
-                    'type':file_type})
-
-    df_media = pd.DataFrame(media_dict_list)
+                if in_shard:
+                    media_dict_list.append(retrieve_file_info(root, file))
+                    media_order_list.append(media_order)
+                media_order += 1
+
+    df_media = pd.DataFrame(media_dict_list, index = media_order_list)
     # Removing any duplicate full file paths from this list:
     df_media.drop_duplicates(subset='path', inplace = True)
         
     # https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.apply.html
-    df_media.to_csv(f'{folder_name}_media_list.csv', index = False)
+    if shard_count is None:
+        df_media.to_csv(f'{folder_name}_media_list.csv', index = False)
+    else:
+        df_media.to_csv(f'{folder_name}_media_list.csv', 
+        index_label = 'media_order')
     return df_media
 
-def retrieve_pic_locations(df_pics):
+def extract_pic_metadata(path, extract_thumbnail = False):
+    '''Retrieves the geotag (geographic coordinate) and creation time of 
+    a single picture. Returns a dictionary that contains 'lat' and 'lon'
+    keys (if a geotag was found) and a 'utc_metadata_creation_time' key
+    (if a creation time was found). This function is called by 
+    retrieve_pic_locations for each picture.
+
+    extract_thumbnail: If True, the JPEG thumbnail that many cameras and
+    phones embed within their EXIF data will also be returned (as bytes)
+    under a 'thumbnail' key. exifread reads past this thumbnail anyway
+    when parsing the EXIF data, so this doesn't require a second pass over
+    the file.'''
+    import exifread # Installed via 'pip install exifread'. See
+    # https://github.com/ianare/exif-py
+    pic_metadata = {}
+    # The following code is based on
+    # https://github.com/ianare/exif-py .
+    with open(path, 'rb') as file_handle:
+        current_image = exifread.process_file(
+        file_handle, extract_thumbnail=extract_thumbnail,
+        builtin_types=True, details=False)
+        # Storing all of the keys from the current_image
+        # dictionary as a set:
+        available_metadata = set(current_image)
+    if extract_thumbnail == True and 'JPEGThumbnail' in available_metadata:
+        pic_metadata['thumbnail'] = bytes(current_image['JPEGThumbnail'])
+    if set({'GPS GPSLatitude', 'GPS GPSLatitudeRef',
+           'GPS GPSLongitude', 'GPS GPSLongitudeRef'}).issubset(
+        available_metadata):      
+        # Based on https://pypi.org/project/exif/
+
+        lat_list = current_image['GPS GPSLatitude']
+        lat_ref = current_image['GPS GPSLatitudeRef']
+        # lat_list (which may actually be a list)
+        # contains 3 numbers representing the 
+        # degrees, minutes, and seconds that make up the
+        # latitude coordinate, and lat_ref contains either
+        # 'N' (for North) or 'S' (for South). lon_list
+        # and lon_ref have similar formats. 
+
+        lon_list = current_image['GPS GPSLongitude']
+        lon_ref = current_image['GPS GPSLongitudeRef']
+
+        # The following code converts these degree/minute/second
+        # values into decimal degrees in order to make plotting
+        # them easier.
+        decimal_lat = lat_list[0] + lat_list[1]/60 + lat_list[2]/3600
+        if lat_ref == 'S':
+            decimal_lat *= -1
+        
+        decimal_lon = lon_list[0] + lon_list[1]/60 + lon_list[2]/3600
+        if lon_ref == 'W':
+            decimal_lon *= -1
+        
+        pic_metadata['lat'] = decimal_lat 
+        pic_metadata['lon'] = decimal_lon
+
+        # If no geotag data is found, the file will maintain its
+        # default coordinates of 0, 0 that the mapping code will then
+        # exclude.
+
+    # The following try/except statement searches for a 'datetime'
+    # value within the EXIF data. (It's kept separate so that a 
+    # malformed datetime won't cause an otherwise valid geotag to get
+    # discarded.)
+
+    # Determining the UTC time at which this image was
+    # taken: (Note that both the original time and the offset
+    # are necessary in order to calculate this value.)
+    # Checking whether the values we need in order to 
+    # produce this calculation are available within
+    # our available metadata:
+    try:
+        if set({'EXIF DateTimeOriginal', 
+                'EXIF OffsetTimeOriginal'}).issubset(
+            available_metadata):
+            # Based on ChristopheD's response at
+            # https://stackoverflow.com/a/2765967/13097194
+            datetime_with_offset = (
+            current_image['EXIF DateTimeOriginal'] 
+            + current_image['EXIF OffsetTimeOriginal'])
+            pic_metadata['utc_metadata_creation_time'] = pd.to_datetime(
+            datetime_with_offset, utc=True)
+        elif set({'GPS GPSTimeStamp', 'GPS GPSDate'}).issubset(
+            available_metadata):
+        # Retrieving what I believe to be UTC time from
+        # the GPS timestamp instead: (This is often available
+        # when offset_time is not.)
+        # (See https://exiftool.org/geotag.html)
+            h, m, s, = current_image['GPS GPSTimeStamp']
+            # These values showed up as 4.0, 13.0, and 34.0 in
+            # the clip I checked--so some reformatting will
+            # be necessary to convert them into timestamp-compatible
+            # values.
+            datetime_from_gps = (
+                current_image['GPS GPSDate'] + " " + ( 
+            str(int(h)).zfill(2) + ":"+  str(int(m)).zfill(2) + ":"+
+            str(int(s)).zfill(2)))
+            pic_metadata['utc_metadata_creation_time'] = pd.to_datetime(
+                datetime_from_gps, utc = True)
+            # Note that passing utc=True will convert timestamps from
+            # a localized time zone to UTC. For instance,
+            # if the argument to pd.to_datetime() here is 
+            # '2025-09-28 15:02:56-04:00',
+            # the output will be Timestamp('2025-09-28 19:02:56+0000', tz='UTC') .
+            # (Note that the time is advanced four hours and the -4
+            # offset is replaced with +0.)
+    except:
+        pass
+    return pic_metadata
+
+
+def retrieve_pic_locations(df_pics, extraction_guard = None, 
+thumbnail_store = None, extracted_metadata = None):
     ''' This function retrieves the geotag (geographic coordinate)
     data from a list of pictures. It assumes that the column names
     are the same as those created within generate_media_list.
@@ -143,7 +328,22 @@ def retrieve_pic_locations(df_pics):
     I have tested out this function with image files from both Samsung
     and Apple phones, but some tweaking may be needed in order to get it 
     to work on other devices. 
+
+    extraction_guard: An optional ExtractionGuard object that enforces
+    per-file time limits (and keeps track of problematic files). If this
+    is None, each file will be read without a time limit.
+
+    thumbnail_store: An optional ThumbnailStore object. If one is passed,
+    each picture's embedded EXIF thumbnail (if present) will be retrieved
+    during the same read as its geotag and added to this store; its ID 
+    will then be saved within a 'thumbnail_id' column.
+
+    extracted_metadata: An optional dictionary that maps df_pics' index
+    values to the output of extract_pic_metadata. If this is passed, 
+    no files will be read; instead, the metadata within this dictionary
+    will be used. (See extract_media_in_locality_order.)
     '''
+    from tqdm import tqdm
 
     # Creating new columns within df_pics that will be filled in with
     # data retrieved within this loop:
@@ -179,123 +379,52 @@ def retrieve_pic_locations(df_pics):
     lon_column_position = df_pics.columns.get_loc('lon')
     utc_metadata_creation_time_position = df_pics.columns.get_loc(
         'utc_metadata_creation_time')
+    extract_thumbnail = thumbnail_store is not None
+    if extract_thumbnail == True:
+        df_pics['thumbnail_id'] = ''
+        thumbnail_id_position = df_pics.columns.get_loc('thumbnail_id')
     
-    for i in tqdm(range(len(df_pics))):
+    if extraction_guard is not None and extracted_metadata is None:
+        # The guard may skip some files or move them to the end of the list.
+        row_positions = extraction_guard.order_positions(df_pics['path'])
+    else:
+        row_positions = range(len(df_pics))
+    for i in tqdm(row_positions):
         path = df_pics.iloc[i]['path']
         #print("Current file:", path)
         # tqdm creates a handy progress bar for for loops. See
         # https://tqdm.github.io/
-        # There are two try/except statements nested within another 
-        # try/except statement below. This method allows the function
-        # to only try to generate current_image once, thus saving time.
-        try:
-            # The following code is based on
-            # https://github.com/ianare/exif-py .
-            with open(path, 'rb') as file_handle:
-                current_image = exifread.process_file(
-                file_handle, extract_thumbnail=False,
-                builtin_types=True, details=False)
-                # Storing all of the keys from the current_image
-                # dictionary as a set:
-                available_metadata = set(current_image)
-                # Here with editing
-            if set({'GPS GPSLatitude', 'GPS GPSLatitudeRef',
-                   'GPS GPSLongitude', 'GPS GPSLongitudeRef'}).issubset(
-                available_metadata):      
-                # Based on https://pypi.org/project/exif/
-
-                lat_list = current_image['GPS GPSLatitude']
-                lat_ref = current_image['GPS GPSLatitudeRef']
-                # lat_list (which may actually be a list)
-                # contains 3 numbers representing the 
-                # degrees, minutes, and seconds that make up the
-                # latitude coordinate, and lat_ref contains either
-                # 'N' (for North) or 'S' (for South). lon_list
-                # and lon_ref have similar formats. 
-
-                lon_list = current_image['GPS GPSLongitude']
-                lon_ref = current_image['GPS GPSLongitudeRef']
-
-                # The following code converts these degree/minute/second
-                # values into decimal degrees in order to make plotting
-                # them easier.
-                decimal_lat = lat_list[0] + lat_list[1]/60 + lat_list[2]/3600
-                if lat_ref == 'S':
-                    decimal_lat *= -1
-                
-                decimal_lon = lon_list[0] + lon_list[1]/60 + lon_list[2]/3600
-                if lon_ref == 'W':
-                    decimal_lon *= -1
-                
-                photo_location_lat = decimal_lat 
-                photo_location_lon = decimal_lon
-
-                df_pics.iloc[i, lat_column_position] = photo_location_lat
-                df_pics.iloc[i, lon_column_position] = photo_location_lon
-
-    
-                # If no geotag data is found, the file will maintain its
-                # default coordinates of 0, 0 that the mapping code will then
-                # exclude.
-
-
-            # The following try/except statement searches for a 'datetime'
-            # value within the EXIF data. On certain devices on which
-            # I tested this function, this datetime value had colons separating
-            # the year, month, and date. Therefore, in order to get Pandas to 
-            # convert it into a Pandas DateTime value, I first needed to
-            # replace the first two colons in the datetime value
-            # with hyphens (hence the replace() call below).
-
-            # Determining the UTC time at which this image was
-            # taken: (Note that both the original time and the offset
-            # are necessary in order to calculate this value.)
-            # Checking whether the values we need in order to 
-            # produce this calculation are available within
-            # our available metadata:
-            if set({'EXIF DateTimeOriginal', 
-                    'EXIF OffsetTimeOriginal'}).issubset(
-                available_metadata):
-                # Based on ChristopheD's response at
-                # https://stackoverflow.com/a/2765967/13097194
-                datetime_with_offset = (
-                current_image['EXIF DateTimeOriginal'] 
-                + current_image['EXIF OffsetTimeOriginal'])
-                utc_metadata_creation_time = pd.to_datetime(
-                datetime_with_offset, utc=True)
-                df_pics.iloc[i, 
-                utc_metadata_creation_time_position] = utc_metadata_creation_time
-            elif set({'GPS GPSTimeStamp', 'GPS GPSDate'}).issubset(
-                available_metadata):
-            # Retrieving what I believe to be UTC time from
-            # the GPS timestamp instead: (This is often available
-            # when offset_time is not.)
-            # (See https://exiftool.org/geotag.html)
-                h, m, s, = current_image['GPS GPSTimeStamp']
-                # These values showed up as 4.0, 13.0, and 34.0 in
-                # the clip I checked--so some reformatting will
-                # be necessary to convert them into timestamp-compatible
-                # values.
-                datetime_from_gps = (
-                    current_image['GPS GPSDate'] + " " + ( 
-                str(int(h)).zfill(2) + ":"+  str(int(m)).zfill(2) + ":"+
-                str(int(s)).zfill(2)))
-                utc_metadata_creation_time = pd.to_datetime(
-                    datetime_from_gps, utc = True)
-                # Note that passing utc=True will convert timestamps from
-                # a localized time zone to UTC. For instance,
-                # if the argument to pd.to_datetime() here is 
-                # '2025-09-28 15:02:56-04:00',
-                # the output will be Timestamp('2025-09-28 19:02:56+0000', tz='UTC') .
-                # (Note that the time is advanced four hours and the -4
-                # offset is replaced with +0.)
-                df_pics.iloc[i, 
-                utc_metadata_creation_time_position] = utc_metadata_creation_time
-        except:
-            pass
+        if extracted_metadata is not None:
+            pic_metadata = extracted_metadata.get(df_pics.index[i])
+        else:
+            pic_metadata = extract_media_metadata(path, 'pic', 
+            extraction_guard = extraction_guard, 
+            extract_thumbnail = extract_thumbnail)
+        if pic_metadata is None:
+            continue
+        if 'lat' in pic_metadata:
+            df_pics.iloc[i, lat_column_position] = pic_metadata['lat']
+            df_pics.iloc[i, lon_column_position] = pic_metadata['lon']
+        if 'utc_metadata_creation_time' in pic_metadata:
+            df_pics.iloc[i, utc_metadata_creation_time_position] = \
+            pic_metadata['utc_metadata_creation_time']
+        if 'thumbnail' in pic_metadata:
+            df_pics.iloc[i, thumbnail_id_position] = thumbnail_store.add(
+                pic_metadata['thumbnail'])
+        elif 'thumbnail_id' in pic_metadata and extract_thumbnail == True:
+            df_pics.iloc[i, thumbnail_id_position] = pic_metadata[
+                'thumbnail_id']
+    if extract_thumbnail == True:
+        thumbnail_store.save_index()
 
     df_pics['lat'] = pd.to_numeric(df_pics['lat'])
     df_pics['lon'] = pd.to_numeric(df_pics['lon'])
+    # The following columns are added in so that the columns of df_pics
+    # will match those of df_clips. (This version of the code doesn't 
+    # retrieve picture altitudes.)
+    df_pics['altitude'] = np.nan
+    df_pics['valid_location'] = (df_pics['lat'] != 0) | (
+        df_pics['lon'] != 0)
     # Replacing all beginning-of-epoch values with pd.NaT:
     df_pics['utc_metadata_creation_time'] = df_pics[
     'utc_metadata_creation_time'].replace(
@@ -304,25 +433,253 @@ def retrieve_pic_locations(df_pics):
     return df_pics
 
 
-def retrieve_clip_locations(df_clips):
+# The following pattern matches ISO 6709 location strings such as
+# '+32.0796+034.7678/' (Samsung) or '+40.0150-105.2705+1624.000/' (Apple).
+# Latitudes can be expressed as degrees (DD), degrees and minutes (DDMM),
+# or degrees, minutes, and seconds (DDMMSS), with an optional decimal 
+# fraction of the last unit; longitudes use the same formats with an extra
+# degree digit. An altitude and a coordinate reference system ('CRS') 
+# identifier may follow. See https://en.wikipedia.org/wiki/ISO_6709
+ISO6709_PATTERN = (r'^\s*(?P<lat_sign>[+-])(?P<lat_int>\d{2}|\d{4}|\d{6})'
+r'(?P<lat_frac>\.\d+)?(?P<lon_sign>[+-])(?P<lon_int>\d{3}|\d{5}|\d{7})'
+r'(?P<lon_frac>\.\d+)?(?P<altitude>[+-]\d+(?:\.\d+)?)?'
+r'(?:CRS[A-Za-z0-9_:.-]+)?/?\s*$')
+
+
+def iso6709_component_to_degrees(sign, integer_part, fraction, 
+degree_digits):
+    '''Converts the sign, integer, and fraction strings of a latitude 
+    (degree_digits = 2) or longitude (degree_digits = 3) component into
+    decimal degrees. Returns both the converted values and a Series 
+    indicating whether any minutes or seconds values were out of range.'''
+    value = pd.to_numeric(integer_part + fraction.fillna('')).to_numpy(
+        dtype = float, na_value = np.nan)
+    digit_count = integer_part.str.len().to_numpy(dtype = float, 
+    na_value = 0)
+    sign = sign.to_numpy(dtype = object, na_value = '')
+    # DDMM and DDMMSS values are split apart arithmetically rather than via
+    # string slicing so that the fraction (which applies to the last unit)
+    # is carried along automatically.
+    whole_degrees = np.where(digit_count == degree_digits + 4,
+    np.floor(value / 10000), np.floor(value / 100))
+    remainder = value - whole_degrees * np.where(
+        digit_count == degree_digits + 4, 10000, 100)
+    minutes = np.where(digit_count == degree_digits + 4,
+    np.floor(remainder / 100), remainder)
+    seconds = np.where(digit_count == degree_digits + 4,
+    remainder - minutes * 100, 0)
+    degrees = np.where(digit_count == degree_digits, value, 
+    whole_degrees + minutes / 60 + seconds / 3600)
+    degrees = np.where(sign == '-', -degrees, degrees)
+    units_in_range = (digit_count == degree_digits) | (
+        (minutes < 60) & (seconds < 60))
+    return (pd.Series(degrees, index = integer_part.index), 
+    pd.Series(units_in_range, index = integer_part.index))
+
+
+def parse_iso6709_locations(raw_locations):
+    '''This function converts a Series of ISO 6709 location strings (such as
+    the raw_location values retrieved within retrieve_clip_locations) into 
+    decimal-degree coordinates. All strings are parsed within a single
+    vectorized str.extract() call, so no per-row Python code is needed.
+
+    Returns a DataFrame (with the same index as raw_locations) containing
+    lat, lon, and altitude columns along with a valid_location column.
+    valid_location will be False for strings that couldn't be parsed and
+    for coordinates that fall outside the valid range; lat, lon, and 
+    altitude will be NaN in the former case.
+    '''
+    df_components = raw_locations.astype('string').str.extract(
+        ISO6709_PATTERN)
+    # See https://pandas.pydata.org/docs/reference/api/pandas.Series.str.extract.html
+    matched = df_components['lat_int'].notna()
+    lat, lat_units_in_range = iso6709_component_to_degrees(
+        df_components['lat_sign'], df_components['lat_int'], 
+        df_components['lat_frac'], 2)
+    lon, lon_units_in_range = iso6709_component_to_degrees(
+        df_components['lon_sign'], df_components['lon_int'], 
+        df_components['lon_frac'], 3)
+    df_parsed = pd.DataFrame({'lat': lat.astype(float), 
+    'lon': lon.astype(float),
+    'altitude': pd.to_numeric(df_components['altitude']).to_numpy(
+        dtype = float, na_value = np.nan)},
+    index = raw_locations.index)
+    df_parsed['valid_location'] = (matched & lat_units_in_range 
+    & lon_units_in_range & (df_parsed['lat'].abs() <= 90) 
+    & (df_parsed['lon'].abs() <= 180)).fillna(False).astype(bool)
+    return df_parsed
+
+
+def probe_clip(path, timeout = None):
+    '''Returns the ffprobe metadata for a clip as a dictionary. 
+    
+    timeout: The number of seconds to wait for ffprobe to finish. If
+    ffprobe is still running after this many seconds, it will be killed
+    and a subprocess.TimeoutExpired error will be raised. If this is None,
+    ffmpeg.probe will be called instead (with no time limit).'''
+    if timeout is None:
+        import ffmpeg # Installed via 'pip install python-ffmpeg'. See
+        # https://github.com/kkroening/ffmpeg-python 
+        return ffmpeg.probe(path)
+        # Based on https://kkroening.github.io/ffmpeg-python/#ffmpeg.probe
+    # The following arguments match those used by ffmpeg.probe.
+    import subprocess
+    completed_process = subprocess.run(['ffprobe', '-show_format', 
+    '-show_streams', '-of', 'json', path], capture_output = True, 
+    timeout = timeout)
+    if completed_process.returncode != 0:
+        raise RuntimeError(f"ffprobe failed for {path}: \
+{completed_process.stderr.decode(errors = 'replace')[-500:]}")
+    return json.loads(completed_process.stdout.decode('utf-8'))
+
+
+def extract_poster_frame(path, seek_seconds = 1.0, width = 160, 
+timeout = None):
+    '''Returns a single frame from a clip (taken seek_seconds into the 
+    clip and scaled to width pixels wide) as JPEG bytes. Because the seek
+    takes place before the input is opened, ffmpeg only needs to read the
+    clip's index and the data surrounding that frame rather than the 
+    entire file. timeout works the same way as it does within 
+    probe_clip.'''
+    import subprocess
+    completed_process = subprocess.run(['ffmpeg', '-v', 'error', 
+    '-ss', str(seek_seconds), '-i', path, '-frames:v', '1', 
+    '-vf', f'scale={width}:-2', '-f', 'image2pipe', '-vcodec', 'mjpeg', 
+    '-q:v', '5', 'pipe:1'], capture_output = True, timeout = timeout)
+    if completed_process.returncode != 0 or len(
+        completed_process.stdout) == 0:
+        raise RuntimeError(f"ffmpeg couldn't retrieve a frame from {path}")
+    return completed_process.stdout
+
+
+def extract_clip_metadata(path, timeout = None, extract_thumbnail = False,
+thumbnail_width = 160):
+    '''Retrieves the raw ISO 6709 location string and creation time of
+    a single clip. Returns a dictionary that contains a 'raw_location' 
+    key (if a location was found) and a 'utc_metadata_creation_time' key
+    (if a creation time was found). This function is called by
+    retrieve_clip_locations for each clip. See probe_clip for an 
+    explanation of timeout.
+    
+    extract_thumbnail: If True, a poster frame (thumbnail_width pixels 
+    wide) will also be returned as JPEG bytes under a 'thumbnail' key. 
+    The clip's duration (which is already available within its metadata)
+    is used to make sure this frame falls within the clip. timeout covers
+    both the ffprobe and ffmpeg calls, so retrieving this frame only gets
+    whatever time ffprobe didn't use. If the frame can't be retrieved 
+    within that time, a subprocess.TimeoutExpired error will be raised 
+    (so that ExtractionGuard can retry or quarantine the clip).'''
+    import subprocess
+    start_time = time.perf_counter()
+    clip_metadata = {}
+    metadata = probe_clip(path, timeout = timeout)
+    # The metadata dictionary for each video clip contains many
+    # different components, so it's necessary to search through
+    # the dictionary in order to retrieve the video location. 
+    # (Some clips, such as screen recordings, don't contain any format
+    # tags at all; these clips simply won't have a location or creation
+    # time, which shouldn't cause them to get quarantined.)
+    tags = metadata.get('format', {}).get('tags', {})
+
+    # I found iPhone video geotag data to be stored within
+    # a 'com.apple.quicktime.location.ISO6709' key, whereas
+    # Samsung video location data was stored within a 'location'
+    # key, hence this if/else statement. Other devices may use
+    # other keys.
+    if 'location' in tags.keys():
+        clip_metadata['raw_location'] = tags['location']
+    elif 'com.apple.quicktime.location.ISO6709' in tags.keys():
+        clip_metadata['raw_location'] = tags[
+            'com.apple.quicktime.location.ISO6709']
+
+    # I found that the st_mtime value (obtained via os.stat()
+    # for at least one file wasn't actually accurate, whereas
+    # the 'creation_time' value within the clip's
+    # metadata was. Therefore, I'll also store
+    # this tag (when it's available).
+    # (As with pictures, a malformed creation time shouldn't cause
+    # the clip's location to get discarded, hence this try/except
+    # statement.)
+    try:
+        if 'creation_time' in tags.keys():
+            clip_metadata['utc_metadata_creation_time'] = pd.to_datetime(
+                tags['creation_time'], utc = True)
+        # Unlike st_mtime, which is 
+        # expressed as an integer,
+        # metadata_creation_time takes the form
+        # of a UTC-formatted string (e.g.
+        # '2025-04-30T23:04:45.000000Z' ).
+        # This value wasn't available within
+        # my older Sony camcorder files. 
+
+        # The following statement searches for a 
+        # 'com.apple.quicktime.creationdate' value within the video
+        # metadata. I imagine this value will only be present within 
+        # Apple devices. (A newer iPhone model that my wife has
+        # did contain a 'creation_time' tag, so this item may only
+        # be necessary for older phones.)
+        elif 'com.apple.quicktime.creationdate' in tags.keys():
+            clip_metadata['utc_metadata_creation_time'] = pd.to_datetime(
+                tags['com.apple.quicktime.creationdate'], utc = True) 
+            # The 'creationdate' tag that I checked
+            # when writing this code showed a full time-zone-aware
+            # datetime and not just the date--so it *should* be
+            # equivalent to a regular 'creation_time' value, though
+            # the offset may be local rather than UTC-based.
+    except:
+        pass
+    if extract_thumbnail == True:
+        remaining_timeout = None
+        if timeout is not None:
+            remaining_timeout = timeout - (time.perf_counter() - start_time)
+            if remaining_timeout <= 0:
+                raise subprocess.TimeoutExpired('ffmpeg', timeout)
+        # A missing poster frame shouldn't cause the clip's location
+        # to get discarded either. (Timeouts, however, are passed along.)
+        try:
+            duration = float(metadata['format'].get('duration', 0))
+            clip_metadata['thumbnail'] = extract_poster_frame(path, 
+            seek_seconds = min(1.0, duration / 2), width = thumbnail_width,
+            timeout = remaining_timeout)
+        except subprocess.TimeoutExpired:
+            raise
+        except:
+            pass
+    return clip_metadata
+
+
+def retrieve_clip_locations(df_clips, extraction_guard = None,
+thumbnail_store = None, extracted_metadata = None):
     ''' This function retrieves the geotag (geographic coordinate)
     data from a list of images. It assumes that the column names
     are the same as those created within generate_media_list.
     I have tested out this function with video files from both Samsung
     and Apple phones, but some tweaking may be needed in order to get it 
     to work on other devices.
+
+    extraction_guard: An optional ExtractionGuard object that enforces
+    per-file time limits (and keeps track of problematic files). If this
+    is None, each file will be probed without a time limit.
+
+    thumbnail_store: An optional ThumbnailStore object. If one is passed,
+    a poster frame will be retrieved for each clip and added to this
+    store; its ID will then be saved within a 'thumbnail_id' column.
+
+    extracted_metadata: An optional dictionary that maps df_clips' index
+    values to the output of extract_clip_metadata. If this is passed, 
+    no files will be read; instead, the metadata within this dictionary
+    will be used. (See extract_media_in_locality_order.)
     '''
+    from tqdm import tqdm
 
     # Setting default values that will then get updated within the 
     # following code if valid data is found for them:
-    # Clips' 'location' values, at least for the videos on my Samsung 
-    # Galaxy S21 Ultra, consists of 17 characters that will then 
-    # get split into a latitude and longitude component below.
-    # Therefore, if no location data is present, the following
-    # default value represents a set of 17 'x' characters that can still be
-    # split into two parts.
-
-    df_clips['raw_location'] = 'xxxxxxxxxxxxxxxxx'
+    # Clips' 'location' values are ISO 6709 strings (e.g. 
+    # '+32.0796+034.7678/') that will get parsed into latitude, longitude,
+    # and altitude components below. Clips without location data will
+    # retain an empty string, which the parser will flag as invalid.
+
+    df_clips['raw_location'] = ''
     
     utc_epoch_start = pd.to_datetime(
     0, unit = 's', utc = True)
@@ -333,97 +690,55 @@ def retrieve_clip_locations(df_clips):
     raw_loc_column_position = df_clips.columns.get_loc('raw_location')
     utc_metadata_creation_time_position = df_clips.columns.get_loc(
         'utc_metadata_creation_time')
+    extract_thumbnail = thumbnail_store is not None
+    if extract_thumbnail == True:
+        df_clips['thumbnail_id'] = ''
+        thumbnail_id_position = df_clips.columns.get_loc('thumbnail_id')
     
-    
-    for i in tqdm(range(len(df_clips))):
+    if extraction_guard is not None and extracted_metadata is None:
+        row_positions = extraction_guard.order_positions(df_clips['path'])
+    else:
+        row_positions = range(len(df_clips))
+    for i in tqdm(row_positions):
         path = df_clips.iloc[i]['path']
-        
-        # There are two try/except statements nested within another 
-        # try/except statement below. This method allows the function
-        # to only try to generate the metadata object once, thus saving time.
-        try:
-            metadata = ffmpeg.probe(path)
-            # Based on https://kkroening.github.io/ffmpeg-python/#ffmpeg.probe
-            # The metadata dictionary for each video clip contains many
-            # different components, so it's necessary to search through
-            # the dictionary in order to retrieve the video location. 
-
-            # I found iPhone video geotag data to be stored within
-            # a 'com.apple.quicktime.location.ISO6709' key, whereas
-            # Samsung video location data was stored within a 'location'
-            # key, hence this if/else statement. Other devices may use
-            # other keys.
-            if 'location' in metadata['format']['tags'].keys():
-                raw_location = metadata['format']['tags']['location']
-                df_clips.iloc[i, 
-                raw_loc_column_position] = raw_location
-            elif 'com.apple.quicktime.location.ISO6709' in metadata[
-            'format']['tags'].keys():
-                raw_location = metadata['format']['tags'][
-                    'com.apple.quicktime.location.ISO6709']
-                df_clips.iloc[i, 
-                raw_loc_column_position] = raw_location
-
-
-            # I found that the st_mtime value (obtained via os.stat()
-            # for at least one file wasn't actually accurate, whereas
-            # the 'creation_time' value within the clip's
-            # metadata was. Therefore, I'll also store
-            # this tag (when it's available).
-
-            if 'creation_time' in metadata[
-                    'format']['tags'].keys():
-                utc_metadata_creation_time = pd.to_datetime(metadata[
-                'format']['tags']['creation_time'], utc = True)
-                df_clips.iloc[i, 
-                utc_metadata_creation_time_position] = utc_metadata_creation_time
-            # Unlike st_mtime, which is 
-            # expressed as an integer,
-            # metadata_creation_time takes the form
-            # of a UTC-formatted string (e.g.
-            # '2025-04-30T23:04:45.000000Z' ).
-            # This value wasn't available within
-            # my older Sony camcorder files. 
-
-            # The following statement searches for a 
-            # 'com.apple.quicktime.creationdate' value within the video
-            # metadata. I imagine this value will only be present within 
-            # Apple devices. (A newer iPhone model that my wife has
-            # did contain a 'creation_time' tag, so this item may only
-            # be necessary for older phones.)
-            
-            elif 'com.apple.quicktime.creationdate' in metadata[
-                'format']['tags'].keys():
-                utc_metadata_creation_time = pd.to_datetime(metadata[
-                    'format']['tags']['com.apple.quicktime.creationdate'],
-                    utc=True) # The 'creationdate' tag that I checked
-                # when writing this code showed a full time-zone-aware
-                # datetime and not just the date--so it *should* be
-                # equivalent to a regular 'creation_time' value, though
-                # the offset may be local rather than UTC-based.
-                df_clips.iloc[i, 
-                utc_metadata_creation_time_position] = utc_metadata_creation_time
-        except:
-            pass
+        if extracted_metadata is not None:
+            clip_metadata = extracted_metadata.get(df_clips.index[i])
+        else:
+            clip_metadata = extract_media_metadata(path, 'clip', 
+            extraction_guard = extraction_guard, 
+            extract_thumbnail = extract_thumbnail)
+        if clip_metadata is None:
+            continue
+        if 'raw_location' in clip_metadata:
+            df_clips.iloc[i, raw_loc_column_position] = clip_metadata[
+                'raw_location']
+        if 'utc_metadata_creation_time' in clip_metadata:
+            df_clips.iloc[i, utc_metadata_creation_time_position] = \
+            clip_metadata['utc_metadata_creation_time']
+        if 'thumbnail' in clip_metadata:
+            df_clips.iloc[i, thumbnail_id_position] = thumbnail_store.add(
+                clip_metadata['thumbnail'])
+        elif 'thumbnail_id' in clip_metadata and extract_thumbnail == True:
+            df_clips.iloc[i, thumbnail_id_position] = clip_metadata[
+                'thumbnail_id']
+    if extract_thumbnail == True:
+        thumbnail_store.save_index()
     
-    # The first 8 characters within 'raw_location' contain latitude data, 
-    # so they will be stored within df_clips['lat'].
-    df_clips['lat'] = df_clips['raw_location'].str[0:8]
-    # The next 9 characters contain longitude data, so they'll be stored
-    # # within df_clips['lon']. 
-    df_clips['lon'] = df_clips['raw_location'].str[8:17]
-    # There may also be elevation data present depending on your device,
-    # but this version of the code doesn't make use of that data.
-
-    # Now that the entries with missing geographic coordinates have been
-    # separated into latitude and longitude components, they can be converted
-    # to 0 so that the subsequent pd.to_numeric function will work.
-
-    df_clips['lat'] = df_clips['lat'].str.replace('xxxxxxxx', '0')
-    df_clips['lon'] = df_clips['lon'].str.replace('xxxxxxxxx', '0')
+    # Converting the raw ISO 6709 location strings into decimal degrees.
+    # (Earlier versions of this function sliced fixed character positions
+    # out of these strings, which only worked for devices that used the 
+    # same precision as my Samsung phone and didn't include altitude data.)
+    df_parsed_locations = parse_iso6709_locations(df_clips['raw_location'])
     
-    df_clips['lat'] = pd.to_numeric(df_clips['lat'])
-    df_clips['lon'] = pd.to_numeric(df_clips['lon'])
+    # Clips without a valid location are assigned coordinates of 0, 0 
+    # so that (as with pictures) they'll get excluded from maps.
+    df_clips['lat'] = df_parsed_locations['lat'].where(
+        df_parsed_locations['valid_location'], 0.0)
+    df_clips['lon'] = df_parsed_locations['lon'].where(
+        df_parsed_locations['valid_location'], 0.0)
+    df_clips['altitude'] = df_parsed_locations['altitude'].where(
+        df_parsed_locations['valid_location'])
+    df_clips['valid_location'] = df_parsed_locations['valid_location']
 
     df_clips['utc_metadata_creation_time'] = df_clips[
     'utc_metadata_creation_time'].replace(
@@ -433,37 +748,1013 @@ def retrieve_clip_locations(df_clips):
     
 
 
-def generate_loc_list(df_media, folder_name):
+def extraction_worker_loop(connection):
+    '''Runs within the worker process created by ExtractionGuard. Receives
+    (function, args, kwargs) tuples through connection, calls each 
+    function, and sends back either (True, result) or (False, error 
+    error). A None request ends the loop.'''
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        function, args, kwargs = request
+        try:
+            connection.send((True, function(*args, **kwargs)))
+        except Exception as e:
+            # Sending the error itself allows OSErrors to get retried
+            # by the guard. (A few exception types can't be pickled, so 
+            # these get converted into RuntimeErrors.)
+            try:
+                connection.send((False, e))
+            except Exception:
+                connection.send((False, RuntimeError(
+                    f"{type(e).__name__}: {e}")))
+
+
+class ExtractionGuard:
+    '''This class keeps a single corrupt file or stalled read from hanging
+    an entire extraction run. It can be passed to generate_loc_list 
+    (or to retrieve_pic_locations and retrieve_clip_locations) via the
+    extraction_guard argument.
+
+    Each file gets a time budget (pic_timeout or clip_timeout seconds).
+    Pictures are read within a separate worker process that gets killed
+    (and replaced) if it runs past this budget; clips are probed by an
+    ffprobe process that gets killed in the same situation. Files that 
+    time out or raise an OSError are retried up to max_retries times 
+    (with the budget multiplied by retry_timeout_multiplier each time).
+
+    Files that fail, time out, or take longer than slow_file_fraction 
+    times their budget are added to a quarantine list that gets saved to
+    quarantine_path after every change, so it persists across runs. 
+    quarantine_mode determines how these files are handled in later runs:
+    'last' (the default) processes them after all other files; 'skip' 
+    doesn't process them at all; and 'retry' processes them in their 
+    regular order. Files that later get read successfully (and quickly)
+    are removed from the list.
+
+    Finally, if recent reads start taking more than latency_spike_factor
+    times as long as usual (e.g. because a network drive or an external
+    hard drive is struggling), the guard will pause between files. This
+    pause doubles while the slowdown continues (up to max_delay seconds)
+    and shrinks once read times return to normal.
+
+    Example:
+    with ExtractionGuard('combined_quarantine.json') as extraction_guard:
+        df_locations = generate_loc_list(df_media, 'combined',
+        extraction_guard = extraction_guard)
+    '''
+
+    def __init__(self, quarantine_path, pic_timeout = 30, clip_timeout = 60,
+    max_retries = 1, retry_timeout_multiplier = 2, quarantine_mode = 'last',
+    slow_file_fraction = 0.5, latency_spike_factor = 4, min_delay = 0.5,
+    max_delay = 30, baseline_sample_count = 20):
+        if quarantine_mode not in ['last', 'skip', 'retry']:
+            raise ValueError("quarantine_mode must be 'last', 'skip', or \
+'retry'.")
+        self.quarantine_path = quarantine_path
+        self.timeouts = {'pic': pic_timeout, 'clip': clip_timeout}
+        self.max_retries = max_retries
+        self.retry_timeout_multiplier = retry_timeout_multiplier
+        self.quarantine_mode = quarantine_mode
+        self.slow_file_fraction = slow_file_fraction
+        self.latency_spike_factor = latency_spike_factor
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.baseline_sample_count = baseline_sample_count
+        if quarantine_path is not None and os.path.exists(quarantine_path):
+            with open(quarantine_path) as file_handle:
+                self.quarantine = json.load(file_handle)
+        else:
+            self.quarantine = {}
+        # Read times are tracked separately for each media type, since 
+        # probing a clip usually takes much longer than reading a 
+        # picture's EXIF data. The baseline is a slow-moving average of
+        # typical read times; the recent average responds to spikes 
+        # within a few files.
+        self.latency = {media_type: {'baseline': None, 'recent': None,
+        'count': 0} for media_type in self.timeouts}
+        self.delay = 0
+        self.stats = {'files': 0, 'retries': 0, 'timeouts': 0, 'errors': 0,
+        'slow_files': 0, 'skipped': 0, 'throttle_seconds': 0.0}
+        self.worker = None
+        self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _start_worker(self):
+        import multiprocessing
+        self.connection, worker_connection = multiprocessing.Pipe()
+        self.worker = multiprocessing.Process(target = extraction_worker_loop,
+        args = (worker_connection,), daemon = True)
+        self.worker.start()
+        worker_connection.close()
+
+    def _kill_worker(self):
+        # The worker is killed rather than asked to stop, since it may be 
+        # stuck in an endless parsing loop or a stalled read. (A process
+        # that's waiting on a stalled network read may not exit right
+        # away, so it's abandoned rather than waited on indefinitely.)
+        self.worker.kill()
+        self.worker.join(timeout = 1)
+        self.connection.close()
+        self.worker = None
+        self.connection = None
+
+    def close(self):
+        '''Stops the worker process (if one is running).'''
+        if self.worker is not None:
+            try:
+                self.connection.send(None)
+                self.worker.join(timeout = 5)
+            except:
+                pass
+            if self.worker.is_alive():
+                self._kill_worker()
+            self.worker = None
+            self.connection = None
+
+    def _call_in_worker(self, function, args, kwargs, timeout):
+        if self.worker is None or not self.worker.is_alive():
+            self._start_worker()
+        self.connection.send((function, args, kwargs))
+        if not self.connection.poll(timeout):
+            self._kill_worker()
+            raise TimeoutError(f"No result after {timeout} seconds")
+        succeeded, result = self.connection.recv()
+        if succeeded == False:
+            raise result
+        return result
+
+    def _call(self, function, path, media_type, timeout, function_kwargs):
+        if media_type == 'clip':
+            # ffprobe runs as its own process, so the timeout can be 
+            # applied to it directly.
+            import subprocess
+            try:
+                return function(path, timeout = timeout, **function_kwargs)
+            except subprocess.TimeoutExpired:
+                raise TimeoutError(f"No result after {timeout} seconds")
+        return self._call_in_worker(function, (path,), function_kwargs, 
+        timeout)
+
+    def save_quarantine(self):
+        '''Saves the quarantine list to quarantine_path. (The list is 
+        written to a temporary file first so that an interrupted save
+        won't corrupt the existing list.)'''
+        if self.quarantine_path is None:
+            return
+        temporary_path = self.quarantine_path + '.tmp'
+        with open(temporary_path, 'w') as file_handle:
+            json.dump(self.quarantine, file_handle, indent = 2)
+        os.replace(temporary_path, self.quarantine_path)
+
+    def _quarantine_file(self, path, reason, attempts, seconds, 
+    message = ''):
+        previous_entry = self.quarantine.get(path, {})
+        self.quarantine[path] = {'reason': reason, 'attempts': attempts,
+        'seconds': round(seconds, 3), 'message': message,
+        'failure_count': previous_entry.get('failure_count', 0) + (
+            0 if reason == 'slow' else 1),
+        'last_seen': datetime.datetime.now(
+            datetime.timezone.utc).isoformat()}
+        self.save_quarantine()
+
+    def order_positions(self, paths):
+        '''Returns the positions (within paths, a list or Series of file
+        paths) in which files should be processed, based on 
+        quarantine_mode.'''
+        regular_positions = []
+        quarantined_positions = []
+        for position, path in enumerate(paths):
+            if path in self.quarantine:
+                quarantined_positions.append(position)
+            else:
+                regular_positions.append(position)
+        if len(quarantined_positions) == 0 or self.quarantine_mode == 'retry':
+            return list(range(len(paths)))
+        if self.quarantine_mode == 'skip':
+            print(f"Skipping {len(quarantined_positions)} quarantined \
+files.")
+            self.stats['skipped'] += len(quarantined_positions)
+            return regular_positions
+        print(f"Processing {len(quarantined_positions)} quarantined files \
+last.")
+        return regular_positions + quarantined_positions
+
+    def _update_latency(self, media_type, seconds):
+        '''Updates the read-time averages for media_type, then pauses
+        (or shortens the current pause) as needed.'''
+        latency = self.latency[media_type]
+        latency['count'] += 1
+        if latency['baseline'] is None:
+            latency['baseline'] = seconds
+            latency['recent'] = seconds
+            return
+        latency['recent'] = 0.7 * latency['recent'] + 0.3 * seconds
+        spiking = (latency['count'] > self.baseline_sample_count 
+        and latency['recent'] > self.latency_spike_factor * max(
+            latency['baseline'], 0.001))
+        if spiking:
+            if self.delay == 0:
+                print(f"Read times have risen to {latency['recent']:.2f} \
+seconds per {media_type} (vs. {latency['baseline']:.2f} normally); pausing \
+between files.")
+            self.delay = min(max(self.delay * 2, self.min_delay), 
+            self.max_delay)
+        else:
+            # The baseline is only updated when reads aren't spiking so 
+            # that a long slowdown won't become the new normal.
+            latency['baseline'] = 0.95 * latency['baseline'] + 0.05 * seconds
+            self.delay = self.delay / 2 if self.delay >= self.min_delay else 0
+        if self.delay > 0:
+            time.sleep(self.delay)
+            self.stats['throttle_seconds'] += self.delay
+
+    def run(self, function, path, media_type, **function_kwargs):
+        '''Calls function (e.g. extract_pic_metadata or 
+        extract_clip_metadata) on path within the time budget for 
+        media_type ('pic' or 'clip'), retrying and quarantining the file
+        as needed. Any function_kwargs will also be passed to function.
+        Returns the function's output, or None if the file couldn't be 
+        read.'''
+        self.stats['files'] += 1
+        timeout = self.timeouts[media_type]
+        start_time = time.perf_counter()
+        for attempt in range(1, self.max_retries + 2):
+            attempt_start_time = time.perf_counter()
+            try:
+                result = self._call(function, path, media_type, timeout,
+                function_kwargs)
+            except (TimeoutError, OSError) as e:
+                # Timeouts and I/O errors may be temporary, so these 
+                # files are retried.
+                reason = 'timeout' if isinstance(e, TimeoutError) else 'error'
+                if attempt <= self.max_retries:
+                    self.stats['retries'] += 1
+                    timeout *= self.retry_timeout_multiplier
+                    continue
+                self.stats['timeouts' if reason == 'timeout' 
+                else 'errors'] += 1
+                self._quarantine_file(path, reason, attempt, 
+                time.perf_counter() - start_time, str(e))
+                self._update_latency(media_type, 
+                time.perf_counter() - attempt_start_time)
+                return None
+            except Exception as e:
+                # Other errors (e.g. from corrupt files) won't be fixed
+                # by a retry.
+                self.stats['errors'] += 1
+                self._quarantine_file(path, 'error', attempt, 
+                time.perf_counter() - start_time, str(e))
+                return None
+            seconds = time.perf_counter() - attempt_start_time
+            if seconds > self.slow_file_fraction * self.timeouts[media_type]:
+                self.stats['slow_files'] += 1
+                self._quarantine_file(path, 'slow', attempt, seconds)
+            elif path in self.quarantine:
+                del self.quarantine[path]
+                self.save_quarantine()
+            self._update_latency(media_type, seconds)
+            return result
+
+    def summary(self):
+        '''Returns a dictionary of counts (files read, retries, timeouts,
+        errors, slow files, and skipped files) along with the total 
+        number of seconds spent pausing during latency spikes.'''
+        return dict(self.stats, quarantined = len(self.quarantine))
+
+
+class ThumbnailStore:
+    '''This class stores thumbnails (e.g. the JPEG thumbnails embedded 
+    within pictures' EXIF data and poster frames from clips) within a 
+    single packed file. Each thumbnail's ID is the SHA-1 hash of its
+    contents, so identical thumbnails (e.g. from duplicate copies of the
+    same picture) only get stored once. An index that maps each ID to its
+    offset and length within the packed file is saved alongside it as 
+    JSON.
+
+    Storing thousands of small thumbnails within one file (rather than
+    one file apiece) keeps the store compact and quick to copy. Maps only
+    need the thumbnails for the files they show, so map_media_locations
+    exports just those thumbnails (see export) rather than the whole store.
+
+    Because thumbnails are appended to the packed file by the process that
+    calls add(), each process should use its own store folder. (For 
+    instance, separate shards should not share a store.)
+
+    Example:
+    thumbnail_store = ThumbnailStore('combined_thumbnails')
+    df_locations = generate_loc_list(df_media, 'combined',
+    thumbnail_store = thumbnail_store)
+    map_media_locations(df_locations, 'combined', folder_path = 'maps',
+    thumbnail_store = thumbnail_store)
+    '''
+
+    def __init__(self, store_folder):
+        self.store_folder = store_folder
+        os.makedirs(store_folder, exist_ok = True)
+        self.pack_path = join(store_folder, 'thumbnails.pack')
+        self.index_path = join(store_folder, 'thumbnails_index.json')
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as file_handle:
+                self.index = json.load(file_handle)
+        else:
+            self.index = {}
+        # If a previous run stopped partway through writing the packed
+        # file, any index entries that extend past its end are dropped.
+        # (Thumbnails that were written but never indexed simply take up
+        # space until the store is rebuilt.)
+        pack_size = (os.path.getsize(self.pack_path) if os.path.exists(
+            self.pack_path) else 0)
+        self.index = {thumbnail_id: entry for thumbnail_id, entry in 
+        self.index.items() if entry[0] + entry[1] <= pack_size}
+
+    def __contains__(self, thumbnail_id):
+        return thumbnail_id in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def add(self, data):
+        '''Appends data (the bytes of a JPEG thumbnail) to the packed file
+        (unless an identical thumbnail is already present), then returns
+        its ID.'''
+        thumbnail_id = hashlib.sha1(data).hexdigest()
+        if thumbnail_id not in self.index:
+            with open(self.pack_path, 'ab') as file_handle:
+                file_handle.seek(0, os.SEEK_END)
+                offset = file_handle.tell()
+                file_handle.write(data)
+            self.index[thumbnail_id] = [offset, len(data)]
+        return thumbnail_id
+
+    def save_index(self):
+        '''Saves the index to thumbnails_index.json. (This gets called at
+        the end of retrieve_pic_locations and retrieve_clip_locations.)'''
+        temporary_path = self.index_path + '.tmp'
+        with open(temporary_path, 'w') as file_handle:
+            json.dump(self.index, file_handle)
+        os.replace(temporary_path, self.index_path)
+
+    def get(self, thumbnail_id):
+        '''Returns the bytes of the thumbnail with the specified ID.'''
+        offset, length = self.index[thumbnail_id]
+        with open(self.pack_path, 'rb') as file_handle:
+            file_handle.seek(offset)
+            return file_handle.read(length)
+
+    def export(self, thumbnail_ids, export_folder):
+        '''Writes the thumbnails whose IDs are in thumbnail_ids to 
+        export_folder as f'{thumbnail_id}.jpg' files. IDs that aren't 
+        within the store (including blank/NaN IDs) are ignored, as are
+        thumbnails that were already exported (e.g. for another map saved
+        within the same folder). Returns the number of files written.'''
+        os.makedirs(export_folder, exist_ok = True)
+        export_count = 0
+        if len(self.index) == 0:
+            return export_count
+        with open(self.pack_path, 'rb') as file_handle:
+            for thumbnail_id in set(thumbnail_ids):
+                if thumbnail_id not in self.index:
+                    continue
+                export_path = join(export_folder, f'{thumbnail_id}.jpg')
+                if os.path.exists(export_path):
+                    continue
+                offset, length = self.index[thumbnail_id]
+                file_handle.seek(offset)
+                with open(export_path, 'wb') as export_handle:
+                    export_handle.write(file_handle.read(length))
+                export_count += 1
+        return export_count
+
+
+# Newer Google Takeout exports add a '.supplemental-metadata' suffix to 
+# sidecar names (e.g. 'IMG_1234.jpg.supplemental-metadata.json'). Takeout
+# truncates long sidecar names, so this suffix may be cut off partway 
+# through (e.g. 'IMG_1234.jpg.supplemental-met.json').
+TAKEOUT_SUFFIX = '.supplemental-metadata'
+# Takeout names the sidecar for 'IMG_1234(1).jpg' 'IMG_1234.jpg(1).json'.
+TAKEOUT_DUPLICATE_PATTERN = re.compile(r'^(.*?)(\(\d+\))$')
+
+
+def takeout_media_name(sidecar_name, media_extensions):
+    '''Returns the name of the media file that a Google Takeout JSON 
+    sidecar (e.g. 'IMG_1234.jpg.json') describes (e.g. 'IMG_1234.jpg'), or
+    None if the sidecar's name doesn't end with a media extension once
+    '.json' and any supplemental-metadata/duplicate suffixes have been
+    removed.'''
+    media_name = sidecar_name[:-len('.json')]
+    duplicate_suffix = ''
+    duplicate_match = TAKEOUT_DUPLICATE_PATTERN.match(media_name)
+    if duplicate_match is not None:
+        media_name, duplicate_suffix = duplicate_match.groups()
+    if '.' in media_name:
+        stem, suffix = media_name.rsplit('.', 1)
+        # (Any prefix of TAKEOUT_SUFFIX is removed, as long as what 
+        # remains still ends with a media extension.)
+        if TAKEOUT_SUFFIX.startswith('.' + suffix) and '.' in stem:
+            media_name = stem
+    if '.' not in media_name or media_name.split('.')[-1].lower() not in \
+        media_extensions:
+        return None
+    stem, extension = media_name.rsplit('.', 1)
+    return stem + duplicate_suffix + '.' + extension
+
+
+def parse_takeout_sidecar(path):
+    '''Retrieves the geotag, altitude, and creation time stored within a
+    Google Takeout JSON sidecar, along with the 'title' (i.e. the original
+    media file name) stored within it. Coordinates of 0, 0 (which Takeout
+    uses for items without a location) are left out.'''
+    with open(path, 'rb') as file_handle:
+        sidecar = json.load(file_handle)
+    sidecar_metadata = {'title': sidecar.get('title')}
+    # geoData reflects any location edits made within Google Photos, so 
+    # it's checked before geoDataExif (the location originally stored 
+    # within the file).
+    for geo_key in ['geoData', 'geoDataExif']:
+        geo_data = sidecar.get(geo_key, {})
+        lat = float(geo_data.get('latitude', 0))
+        lon = float(geo_data.get('longitude', 0))
+        if (lat != 0) or (lon != 0):
+            sidecar_metadata['lat'] = lat
+            sidecar_metadata['lon'] = lon
+            if 'altitude' in geo_data:
+                sidecar_metadata['altitude'] = float(geo_data['altitude'])
+            break
+    # photoTakenTime stores the creation time in seconds since the start
+    # of the Unix epoch (as a string).
+    if 'timestamp' in sidecar.get('photoTakenTime', {}):
+        sidecar_metadata['utc_metadata_creation_time'] = pd.to_datetime(
+            int(sidecar['photoTakenTime']['timestamp']), unit = 's', 
+            utc = True)
+    return sidecar_metadata
+
+
+def read_xmp_value(xmp_text, tag):
+    '''Returns the value of tag (e.g. 'exif:GPSLatitude') within an XMP
+    document, or None if it's missing. XMP writers store values either as
+    attributes (tag="value") or as elements (<tag>value</tag>), so both
+    forms are checked.'''
+    value_match = re.search(re.escape(tag) + 
+    r'''(?:\s*=\s*["']([^"']*)["']|>([^<]*)<)''', xmp_text)
+    if value_match is None:
+        return None
+    return value_match.group(1) if value_match.group(1) is not None \
+    else value_match.group(2)
+
+
+def xmp_coordinate_to_degrees(value):
+    '''Converts an XMP GPS coordinate (e.g. '40,30.25N' or '40,30,15N') 
+    into decimal degrees.'''
+    value = value.strip()
+    direction = value[-1].upper()
+    components = [float(component) for component in value[:-1].split(',')]
+    degrees = sum(component / 60**position for position, component in 
+    enumerate(components))
+    return -degrees if direction in ['S', 'W'] else degrees
+
+
+def parse_xmp_sidecar(path):
+    '''Retrieves the geotag, altitude, and creation time stored within an
+    XMP sidecar (such as those written by Lightroom or darktable). As with
+    pictures' EXIF data, creation times without a UTC offset are left out,
+    since they can't be converted to UTC.'''
+    with open(path, 'r', encoding = 'utf-8', errors = 'replace') as \
+        file_handle:
+        xmp_text = file_handle.read()
+    sidecar_metadata = {}
+    lat_value = read_xmp_value(xmp_text, 'exif:GPSLatitude')
+    lon_value = read_xmp_value(xmp_text, 'exif:GPSLongitude')
+    if lat_value is not None and lon_value is not None:
+        lat = xmp_coordinate_to_degrees(lat_value)
+        lon = xmp_coordinate_to_degrees(lon_value)
+        if (lat != 0) or (lon != 0):
+            sidecar_metadata['lat'] = lat
+            sidecar_metadata['lon'] = lon
+            altitude_value = read_xmp_value(xmp_text, 'exif:GPSAltitude')
+            if altitude_value is not None:
+                # Altitudes are stored as rationals (e.g. '16000/10').
+                numerator, _, denominator = altitude_value.partition('/')
+                altitude = float(numerator) / float(denominator or 1)
+                if read_xmp_value(xmp_text, 'exif:GPSAltitudeRef') == '1':
+                    altitude *= -1 # (1 signifies below sea level)
+                sidecar_metadata['altitude'] = altitude
+    for time_tag in ['exif:DateTimeOriginal', 'photoshop:DateCreated',
+                     'xmp:CreateDate']:
+        time_value = read_xmp_value(xmp_text, time_tag)
+        if time_value is not None and re.search(
+            r'(Z|[+-]\d\d:?\d\d)$', time_value.strip()):
+            sidecar_metadata['utc_metadata_creation_time'] = pd.to_datetime(
+                time_value.strip(), utc = True)
+            break
+    return sidecar_metadata
+
+
+def retrieve_sidecar_locations(df_media):
+    '''Reads the JSON (Google Takeout) and XMP sidecar files within 
+    df_media (a DataFrame created by generate_media_list), then matches
+    them to the pictures and clips that they describe. Returns a DataFrame
+    (indexed the same way as df_media) containing the 'lat', 'lon', 
+    'altitude', 'utc_metadata_creation_time', and 'sidecar_path' values
+    for each picture and clip that has a usable sidecar.
+
+    A sidecar is considered usable if it contains both a location (whose
+    latitude and longitude fall within the same ranges that 
+    parse_iso6709_locations checks) and a creation time; media files 
+    without a usable sidecar will need to be read by 
+    retrieve_pic_locations or retrieve_clip_locations instead.
+
+    Sidecars are matched to media files within the same folder as follows:
+    - 'IMG_1234.jpg.json' (along with Takeout's supplemental-metadata and
+    duplicate variants) and 'IMG_1234.jpg.xmp' match 'IMG_1234.jpg'.
+    - 'IMG_1234.xmp' matches 'IMG_1234.jpg' (or another media file with 
+    the same stem).
+    - If a Takeout sidecar's name was truncated, the 'title' value within
+    it is used instead.
+    '''
+    from tqdm import tqdm
+    # Sidecars larger than 1 MB are skipped, since they're unlikely to be
+    # sidecars at all.
+    df_sidecars = df_media.query("type == 'sidecar' & megabytes < 1")
+    media_extensions = set(df_media.query(
+        "type == 'pic' | type == 'clip'")['extension'])
+
+    # Sidecars are stored within two dictionaries whose keys are 
+    # (folder, name) tuples: one for full media file names and one for 
+    # stems (i.e. names without extensions).
+    sidecars_by_name = {}
+    title_matches = {}
+    sidecars_by_stem = {}
+    for path, name, extension in tqdm(zip(df_sidecars['path'], 
+        df_sidecars['name'], df_sidecars['extension']), 
+        total = len(df_sidecars)):
+        folder = os.path.dirname(path)
+        try:
+            if extension == 'json':
+                sidecar_metadata = parse_takeout_sidecar(path)
+            else:
+                sidecar_metadata = parse_xmp_sidecar(path)
+        except:
+            continue
+        if not {'lat', 'lon', 'utc_metadata_creation_time'}.issubset(
+            sidecar_metadata):
+            continue
+        # A corrupt or hand-edited sidecar could contain an impossible
+        # location, in which case the media file itself will be read.
+        if not (abs(sidecar_metadata['lat']) <= 90 and 
+                abs(sidecar_metadata['lon']) <= 180):
+            continue
+        sidecar_metadata['sidecar_path'] = path
+        if extension == 'json':
+            media_name = takeout_media_name(name, media_extensions)
+            if media_name is not None:
+                sidecars_by_name.setdefault((folder, media_name), 
+                sidecar_metadata)
+            if sidecar_metadata['title'] is not None:
+                title_matches.setdefault((folder, sidecar_metadata['title']),
+                sidecar_metadata)
+        else:
+            media_name = name[:-len('.xmp')]
+            if media_name.split('.')[-1].lower() in media_extensions:
+                sidecars_by_name.setdefault((folder, media_name), 
+                sidecar_metadata)
+            else:
+                sidecars_by_stem.setdefault((folder, media_name), 
+                sidecar_metadata)
+    # Title-based matches are only used for media files that didn't match
+    # a sidecar by name.
+    for key, sidecar_metadata in title_matches.items():
+        sidecars_by_name.setdefault(key, sidecar_metadata)
+
+    df_media_files = df_media.query("type == 'pic' | type == 'clip'")
+    sidecar_dict_list = []
+    sidecar_index_list = []
+    for index, path, name in zip(df_media_files.index, 
+        df_media_files['path'], df_media_files['name']):
+        folder = os.path.dirname(path)
+        sidecar_metadata = sidecars_by_name.get((folder, name))
+        if sidecar_metadata is None:
+            sidecar_metadata = sidecars_by_stem.get(
+                (folder, name.rsplit('.', 1)[0]))
+        if sidecar_metadata is not None:
+            sidecar_dict_list.append(sidecar_metadata)
+            sidecar_index_list.append(index)
+    df_sidecar_locations = pd.DataFrame(sidecar_dict_list, 
+    index = sidecar_index_list, columns = ['lat', 'lon', 'altitude', 
+    'utc_metadata_creation_time', 'sidecar_path'])
+    print(f"Found usable sidecars for {len(df_sidecar_locations)} of \
+{len(df_media_files)} pictures and clips.")
+    return df_sidecar_locations
+
+
+def extract_media_metadata(path, media_type, extraction_guard = None,
+extract_thumbnail = False):
+    '''Calls extract_pic_metadata (if media_type is 'pic') or 
+    extract_clip_metadata (if media_type is 'clip') on path, either 
+    directly or via extraction_guard (if one is passed). Returns the
+    resulting dictionary, or None if the file couldn't be read.'''
+    extraction_function = (extract_pic_metadata if media_type == 'pic'
+    else extract_clip_metadata)
+    if extraction_guard is not None:
+        return extraction_guard.run(extraction_function, path, media_type,
+        extract_thumbnail = extract_thumbnail)
+    try:
+        return extraction_function(path, extract_thumbnail = extract_thumbnail)
+    except:
+        return None
+
+
+# The Linux ioctl request code for FIEMAP, which reports where a file's 
+# data is physically stored on its drive. See
+# https://www.kernel.org/doc/html/latest/filesystems/fiemap.html
+FS_IOC_FIEMAP = 0xC020660B
+
+
+def get_physical_offset(path):
+    '''Returns the physical location (in bytes from the start of the drive)
+    of the first extent of path's data, or None if it isn't available.
+    This function only works on Linux file systems that support FIEMAP 
+    (e.g. ext4, XFS, and Btrfs); other systems will raise an error.'''
+    import fcntl
+    # A struct fiemap header (32 bytes) followed by room for a single
+    # struct fiemap_extent (56 bytes). fm_length is set to the largest 
+    # possible value so that the entire file is covered.
+    fiemap_buffer = bytearray(struct.pack('=QQIIII', 0, 
+    0xFFFFFFFFFFFFFFFF, 0, 0, 1, 0) + bytes(56))
+    file_descriptor = os.open(path, os.O_RDONLY)
+    try:
+        fcntl.ioctl(file_descriptor, FS_IOC_FIEMAP, fiemap_buffer)
+    finally:
+        os.close(file_descriptor)
+    mapped_extent_count = struct.unpack_from('=I', fiemap_buffer, 20)[0]
+    if mapped_extent_count == 0: # (e.g. for empty files)
+        return None
+    return struct.unpack_from('=Q', fiemap_buffer, 40)[0]
+
+
+def get_disk_locality_keys(paths, method = 'auto', sample_size = 20):
+    '''Returns a list of sort keys that will place paths in (approximately)
+    the order in which their data is stored on disk, along with the method
+    used to create those keys. 
+
+    method: 'extent' sorts files by the physical location of their data 
+    (see get_physical_offset); 'inode' sorts them by inode number, which
+    file systems like ext4 allocate near the folders that contain them;
+    and 'directory' simply groups files by folder (in the order in which 
+    each folder first appears), keeping the original order within each 
+    folder. 'auto' tries the first sample_size files with each of these
+    methods in turn and uses the first one that works.
+
+    Files whose physical location or inode can't be determined are placed
+    after all other files and grouped by folder.
+    '''
+    paths = list(paths)
+    folder_ranks = {}
+    fallback_keys = []
+    for position, path in enumerate(paths):
+        folder_rank = folder_ranks.setdefault(os.path.dirname(path), 
+        len(folder_ranks))
+        fallback_keys.append((1, folder_rank, position))
+
+    def get_inode(path):
+        inode = os.stat(path).st_ino
+        return inode if inode > 0 else None
+
+    key_functions = {'extent': get_physical_offset, 'inode': get_inode}
+    if method == 'auto':
+        method = 'directory'
+        for candidate_method in ['extent', 'inode']:
+            try:
+                sample_keys = [key_functions[candidate_method](path) 
+                for path in paths[:sample_size]]
+            except:
+                continue
+            # Some file systems (e.g. certain FAT and network mounts) 
+            # report placeholder inodes, so inodes are only used if they're
+            # distinct.
+            valid_keys = [key for key in sample_keys if key is not None]
+            if len(valid_keys) > 0 and len(set(valid_keys)) == len(
+                valid_keys):
+                method = candidate_method
+                break
+    if method == 'directory':
+        return fallback_keys, method
+
+    locality_keys = []
+    for path, fallback_key in zip(paths, fallback_keys):
+        try:
+            key = key_functions[method](path)
+        except:
+            key = None
+        locality_keys.append((0, key, 0) if key is not None 
+        else fallback_key)
+    return locality_keys, method
+
+
+def order_media_by_disk_locality(df_media, method = 'auto'):
+    '''Returns a copy of df_media (e.g. a DataFrame created by 
+    generate_media_list) whose rows have been sorted so that files 
+    stored near each other on disk are next to each other. The original
+    index is retained, so the original order can be restored via
+    .loc[df_media.index]. See get_disk_locality_keys for an explanation
+    of method.'''
+    locality_keys, method = get_disk_locality_keys(df_media['path'], 
+    method = method)
+    print(f"Ordering {len(df_media)} files by disk locality \
+(method: {method}).")
+    locality_order = sorted(range(len(df_media)), 
+    key = locality_keys.__getitem__)
+    return df_media.iloc[locality_order].copy()
+
+
+def extract_media_in_locality_order(df_media, method = 'auto', 
+extraction_guard = None, thumbnail_store = None):
+    '''Reads the metadata of every picture and clip within df_media in 
+    disk-locality order (see order_media_by_disk_locality), reading 
+    pictures and clips in the same pass so that each area of the drive 
+    only gets visited once. This can greatly reduce the amount of time
+    spent seeking on spinning hard drives, particularly external ones.
+
+    Returns a dictionary that maps each file's index value within 
+    df_media to its extract_pic_metadata or extract_clip_metadata output
+    (or None, if it couldn't be read). This dictionary can then be passed
+    to retrieve_pic_locations and retrieve_clip_locations via their 
+    extracted_metadata arguments. (generate_loc_list does this 
+    automatically when schedule is set to 'locality'.)
+
+    Thumbnails are added to thumbnail_store (if one is passed) as soon as
+    they're read, and only their IDs are kept within the dictionary.
+    '''
+    from tqdm import tqdm
+    df_ordered = order_media_by_disk_locality(df_media.query(
+        "type == 'pic' | type == 'clip'"), method = method)
+    if extraction_guard is not None:
+        df_ordered = df_ordered.iloc[extraction_guard.order_positions(
+            df_ordered['path'])]
+    extract_thumbnail = thumbnail_store is not None
+    extracted_metadata = {}
+    for index, path, media_type in tqdm(zip(df_ordered.index, 
+        df_ordered['path'], df_ordered['type']), total = len(df_ordered)):
+        media_metadata = extract_media_metadata(path, media_type, 
+        extraction_guard = extraction_guard, 
+        extract_thumbnail = extract_thumbnail)
+        if media_metadata is not None and 'thumbnail' in media_metadata:
+            media_metadata['thumbnail_id'] = thumbnail_store.add(
+                media_metadata.pop('thumbnail'))
+        extracted_metadata[index] = media_metadata
+    return extracted_metadata
+
+
+def generate_loc_list(df_media, folder_name, save_output = True,
+extraction_guard = None, thumbnail_store = None, use_sidecars = False,
+schedule = 'dataframe', locality_method = 'auto'):
     ''' This function takes a DataFrame formatted like those returned
     via generate_media_list, then calls retrieve_pic_locations and 
     retrieve_clip locations in order to obtain those files' geographic
     coordinates. 
+
+    save_output: Set to False to skip saving the output as
+    f'{folder_name}_media_locations.csv'. (This is useful when only
+    a handful of new files are being processed; see process_new_media.)
+
+    extraction_guard: An optional ExtractionGuard object that will be 
+    passed to retrieve_pic_locations and retrieve_clip_locations. (See
+    ExtractionGuard for more details.)
+
+    thumbnail_store: An optional ThumbnailStore object in which to save
+    pictures' embedded thumbnails and clips' poster frames. (See 
+    ThumbnailStore for more details.)
+
+    use_sidecars: If True, the JSON and XMP sidecars within df_media will
+    be read first (see retrieve_sidecar_locations), and only the pictures
+    and clips without a usable sidecar will be opened. Since sidecars are
+    only a few kilobytes in size, this can save a great deal of time for 
+    exports (such as Google Takeout archives) that include them. The 
+    output will include a 'location_source' column ('sidecar' or 'media')
+    and a 'sidecar_path' column. (Thumbnails aren't retrieved for files
+    with usable sidecars, since those files never get opened.)
+
+    schedule: If 'dataframe' (the default), all pictures will be read 
+    (in the order in which they appear within df_media), followed by all
+    clips. If 'locality', pictures and clips will instead be read together
+    in the order in which they're stored on disk (see 
+    extract_media_in_locality_order and get_disk_locality_keys, which
+    explains locality_method). Either way, the output will be in the same
+    order.
     '''
+    if use_sidecars == True:
+        print("Reading sidecar files:")
+        df_sidecar_locations = retrieve_sidecar_locations(df_media)
+        # Storing the original order of each media type so that it can
+        # be restored after the sidecar-based and media-based rows are
+        # combined:
+        pic_index = df_media.query("type == 'pic'").index
+        clip_index = df_media.query("type == 'clip'").index
+        has_sidecar = df_media.index.isin(df_sidecar_locations.index)
+        df_sidecar_media = df_media[has_sidecar].copy()
+        df_media = df_media[~has_sidecar]
     # The function first splits df_media into video (df_clips) and picture
     # (df_pics) DataFrames, since the process of retrieving coordinate 
     # data differs for those two media types.
     df_clips = df_media.query("type == 'clip'").copy()
     df_pics = df_media.query("type == 'pic'").copy()
+    extracted_metadata = None
+    if schedule == 'locality':
+        print("Reading pictures and clips in disk order:")
+        extracted_metadata = extract_media_in_locality_order(df_media, 
+        method = locality_method, extraction_guard = extraction_guard,
+        thumbnail_store = thumbnail_store)
     print("Retrieving picture locations:")
-    df_pic_locs = retrieve_pic_locations(df_pics)
+    df_pic_locs = retrieve_pic_locations(df_pics, 
+    extraction_guard = extraction_guard, thumbnail_store = thumbnail_store,
+    extracted_metadata = extracted_metadata)
     print("Retrieving clip locations:")
-    df_clip_locs = retrieve_clip_locations(df_clips)
+    df_clip_locs = retrieve_clip_locations(df_clips, 
+    extraction_guard = extraction_guard, thumbnail_store = thumbnail_store,
+    extracted_metadata = extracted_metadata)
+    if use_sidecars == True:
+        # Adding the same columns to the sidecar-based rows that 
+        # retrieve_pic_locations and retrieve_clip_locations added to the
+        # media-based ones:
+        for col in ['lat', 'lon', 'altitude', 'utc_metadata_creation_time',
+                    'sidecar_path']:
+            df_sidecar_media[col] = df_sidecar_locations[col]
+        df_sidecar_media['raw_location'] = df_sidecar_media['type'].map(
+            {'pic': 0, 'clip': ''})
+        # (retrieve_sidecar_locations only returns sidecars whose 
+        # coordinates are within range.)
+        df_sidecar_media['valid_location'] = True
+        if thumbnail_store is not None:
+            df_sidecar_media['thumbnail_id'] = ''
+        df_sidecar_media['location_source'] = 'sidecar'
+        df_pic_locs['location_source'] = 'media'
+        df_clip_locs['location_source'] = 'media'
+        df_pic_locs = pd.concat([df_pic_locs, df_sidecar_media.query(
+            "type == 'pic'")]).loc[pic_index]
+        df_clip_locs = pd.concat([df_clip_locs, df_sidecar_media.query(
+            "type == 'clip'")]).loc[clip_index]
+        df_pic_locs['sidecar_path'] = df_pic_locs['sidecar_path'].fillna('')
+        df_clip_locs['sidecar_path'] = df_clip_locs['sidecar_path'].fillna(
+            '')
     # Once coordinate data has been retrieved for both df_clips and df_pics,
     # the DataFrames containing this coordinate data (df_clip_locs and 
     # df_pic_locs) can be merged back together.
     df_media_locs = pd.concat([df_pic_locs, df_clip_locs])
+    # (Note that merge_extraction_shards relies on this pictures-then-clips
+    # order when recreating the output of a single-process run.)
     
-    df_media_locs.to_csv(f'{folder_name}_media_locations.csv', index = False)
+    if save_output == True:
+        df_media_locs.to_csv(f'{folder_name}_media_locations.csv', 
+        index = False)
     return df_media_locs
 
 
+def create_point_colormap(locations_to_map, timestamp_column_name, 
+color_points_by, colormap_color_range):
+    '''Adds a column to locations_to_map (a DataFrame prepared within
+    map_media_locations or render_static_map) that reflects the unit of
+    time/order by which points should be colored, then creates a branca 
+    colormap for that column. Returns the name of this column along with
+    the colormap. See map_media_locations for explanations of 
+    color_points_by and colormap_color_range.'''
+    from branca.colormap import LinearColormap # See
+    # https://python-visualization.github.io/branca/colormap.html#branca.colormap.LinearColormap
+    color_col = timestamp_column_name + color_points_by
+    if color_points_by == 'year':
+        locations_to_map[color_col] = locations_to_map[
+        timestamp_column_name].dt.year
+    # I added in the following item because, by default,
+    # Folium (or branca?) adds in comma separators within years.
+    # Since these look unsightly, a workaround is simply to
+    # subtract 2,000 from each year so that no commas appear.
+    # This code will work great until year 3,000! :)
+    if color_points_by == 'year_20xx':
+        locations_to_map[color_col] = locations_to_map[
+        timestamp_column_name].dt.year - 2000
+    if color_points_by == 'month':
+        locations_to_map[color_col] = locations_to_map[
+        timestamp_column_name].dt.month
+    if color_points_by == 'order':
+        # overwriting color_col with sort_order, which will work
+        # great for this condition.
+        color_col = 'sort_order'
+        # Since this column is already filled with the values we 
+        # need, we don't need to take any further steps here.
+
+    colormap = LinearColormap(colors = colormap_color_range,
+    vmin = locations_to_map[color_col].min(), vmax = locations_to_map[
+    color_col].max(), caption = color_points_by.capitalize().replace(
+    '_20xx', ' (20xx)')).to_step(12) # 12 is
+    # a nice default setting here, since it will line up nicely with
+    # the 12 months in the year when color_points_by is set to 'month'.
+    # Splitting color_points_by and keeping only the first element
+    # allows 'year_20xx' to get translated into 'Year'.
+    return color_col, colormap
+
+
+def generate_great_circle_paths(locations_to_map, longitude_cutoff = 80):
+    '''Returns a list of paths (each of which is a list of (latitude, 
+    longitude) tuples) that connect each point in locations_to_map to
+    the point before it. locations_to_map must already be sorted in
+    chronological order. See map_media_locations for an explanation of
+    longitude_cutoff.'''
+    from pyproj import Geod
+    g = Geod(ellps="WGS84")
+    # From https://pyproj4.github.io/pyproj/stable/api/geod.html
+
+    # This loop creates lines by generating a series of points that can 
+    # be plotted on the map. A simple solution would be to simply draw a 
+    # straight line in between the two points. However, this has two issues:
+    # 1. The paths between far-apart points are influenced by the curvature
+    # of the Earth, so plotting linear lines would be unrealistic.
+    # 2. US-to-East-Asia paths would be plotted eastbound rather than 
+    # westbound, which is extremely unrealistic.
+    # Therefore, the following set of code uses the pyproj library to create
+    # great circle paths (e.g. paths that curve along with the Earth)
+    # to better represent the actual paths between points. This may also
+    # make it easier to plot trans-Pacific paths.
+    # However, Folium cuts off lines once they hit the international 
+    # date line. To resolve this issue, I needed to create a new cutoff
+    # point ('longitude_cutoff') and then subtract 360 from 
+    # longitude values that exceeded these coordinates. This ensured 
+    # that paths east of this point (e.g. places east of Central India) 
+    # would appear on the left of the map rather than on the right.
+
+    path_list = []
+    lat_column = locations_to_map.columns.get_loc('lat')
+    lon_column = locations_to_map.columns.get_loc('lon')
+    for i in range(1, len(locations_to_map)):
+        # To plot lines between points, the function first obtains 
+        # the geographic coordinates of the current row and 
+        # the previous row (which is why it's crucial for the DataFrame
+        # passed to this function to have the points in the correct order). 
+        lat = locations_to_map.iloc[i, lat_column]
+        lon = locations_to_map.iloc[i, lon_column]
+
+        prev_lat = locations_to_map.iloc[
+            i-1, locations_to_map.columns.get_loc('lat')]           
+        prev_lon = locations_to_map.iloc[
+            i -1, locations_to_map.columns.get_loc('lon')]
+
+        if (lat == prev_lat) & (lon == prev_lon):
+            continue # If this row's points are the same as the last row's,
+            # there's no need to attempt to draw a line between them.
+        if lon > longitude_cutoff: # See above for explanation
+            mapped_lon = lon - 360
+        else:
+            mapped_lon = lon
+    # This method of reducing far-east longitude points by 360 is based on
+    # the response by 'mourner' at:
+    # https://github.com/Leaflet/Leaflet/issues/82#issuecomment-1260488
+
+
+        if prev_lon > longitude_cutoff:
+            mapped_prev_lon = prev_lon - 360
+        else:
+            mapped_prev_lon = prev_lon
+
+
+    # The following code uses pyproj to create a list of
+    # great circle ('gc') points
+    # that produce curvilinear paths, which are both more accurate
+    # and more aesthetically pleasing than straight paths. From:
+    # https://pyproj4.github.io/pyproj/stable/api/geod.html?highlight=npts#pyproj.Geod.npts
+
+        gc_points = g.npts(mapped_prev_lon, prev_lat,
+            mapped_lon, lat, 20, initial_idx = 0, terminus_idx = 0)
+            # Creates 20 points for each line
+            # See documentation at:
+            # https://pyproj4.github.io/pyproj/stable/api/geod.html
+
+        flipped_gc_points = ([(coords[1], coords[0]-360) 
+        if coords[0] > longitude_cutoff else (coords[1], coords[0])
+        for coords in gc_points]) 
+ 
+        # # The coordinates in gc_points are stored in (longitude, latitude)
+        # format, so the above list comprehension flips them back into
+        # (latitude, longitude) format for plotting. It also modifies
+        # points above the longitude cutoff so that they appear on the
+        # right side of the map, resulting in more accurate paths.
+      
+        path_list.append(flipped_gc_points)
+    return path_list
+
+
 def map_media_locations(df_locations, file_name, folder_path = None, 
 add_paths = False, starting_location = [39, -95], zoom_start = 4, 
 timestamp_column_name = 'utc_metadata_creation_time', longitude_cutoff = 80, 
 marker_type = 'CircleMarker', circle_marker_color = '#ff0000', radius = 5, 
 path_color = '#3388ff', path_weight = 3, tiles = 'OpenStreetMap',
 color_points_by = 'year_20xx', colormap_color_range = ['red', 'blue'],
-show_colormap = True):
+show_colormap = True, thumbnail_store = None, 
+thumbnail_folder_name = 'thumbnails', thumbnail_width = 160,
+layer_period = None, initial_layers = None):
     '''map_media_locations converts lists of files and geographic coordinates
     into maps of those coordinates. It also displays the media creation time
     and geographic coordinates when the user hovers over a map tile. 
@@ -556,8 +1847,30 @@ show_colormap = True):
     show_colormap: Set to True to show a colormap; set to False to hide it.
     This value will get reset to False if color_points by is set to 'same.'
 
-
+    thumbnail_store: An optional ThumbnailStore object. If this is passed
+    (and df_locations has a 'thumbnail_id' column), each file's thumbnail
+    will be exported to a thumbnail_folder_name subfolder of folder_path,
+    and popups will show this thumbnail (thumbnail_width pixels wide)
+    above the file path. The thumbnails only get loaded when their
+    popups are opened, so the map's HTML file stays the same size and
+    opens just as quickly.
+
+    layer_period: Set to 'year' or 'month' to split the map's markers 
+    (and, if add_paths is True, its paths) into one layer per year or 
+    month. Each layer's data is saved once, as a small script within a
+    f'{file_name}_layers' subfolder of folder_path, and only gets loaded
+    when that layer is switched on within the map's layer control. This
+    allows a single map to take the place of separate combined, routes, 
+    and per-year maps without storing the same geotags in each one. (Paths
+    within each layer begin at the last point of the previous layer, so
+    switching on consecutive layers shows a continuous route.)
+
+    initial_layers: A list of the layers (e.g. ['2024', '2025'] or 
+    ['2025-06']) to show when the map is first opened. If this is None,
+    the most recent layer will be shown. Only applies when layer_period
+    is not None.
     '''
+    import folium
     m = folium.Map(location = starting_location, zoom_start = zoom_start, 
     tiles = tiles)
     locations_to_map = df_locations.query("lat != 0 & lon != 0").sort_values(
@@ -580,120 +1893,37 @@ show_colormap = True):
     name_column = locations_to_map.columns.get_loc('name')
     marker_count = 0
 
+    show_thumbnails = (thumbnail_store is not None) and (
+        'thumbnail_id' in locations_to_map.columns)
+    if show_thumbnails == True:
+        thumbnail_id_column = locations_to_map.columns.get_loc(
+            'thumbnail_id')
+        export_count = thumbnail_store.export(
+            locations_to_map['thumbnail_id'], join(
+            folder_path if folder_path != None else '.', 
+            thumbnail_folder_name))
+        print(f"Exported {export_count} new thumbnails.")
+        add_lazy_thumbnail_loader(m)
+
     # Creating a colormap that can be used to assign specific colors to each
     # point:
-    
     if color_points_by != 'same':
-        color_col = timestamp_column_name + color_points_by
-        if color_points_by == 'year':
-            locations_to_map[color_col] = locations_to_map[
-            timestamp_column_name].dt.year
-        # I added in the following item because, by default,
-        # Folium (or branca?) adds in comma separators within years.
-        # Since these look unsightly, a workaround is simply to
-        # subtract 2,000 from each year so that no commas appear.
-        # This code will work great until year 3,000! :)
-        if color_points_by == 'year_20xx':
-            locations_to_map[color_col] = locations_to_map[
-            timestamp_column_name].dt.year - 2000
-        if color_points_by == 'month':
-            locations_to_map[color_col] = locations_to_map[
-            timestamp_column_name].dt.month
-        if color_points_by == 'order':
-            # overwriting color_col with sort_order, which will work
-            # great for this condition.
-            color_col = 'sort_order'
-            # Since this column is already filled with the values we 
-            # need, we don't need to take any further steps here.
-    
-        colormap = LinearColormap(colors = colormap_color_range,
-        vmin = locations_to_map[color_col].min(), vmax = locations_to_map[
-        color_col].max(), caption = color_points_by.capitalize().replace(
-        '_20xx', ' (20xx)')).to_step(12) # 12 is
-        # a nice default setting here, since it will line up nicely with
-        # the 12 months in the year when color_points_by is set to 'month'.
-        # Splitting color_points_by and keeping only the first element
-        # allows 'year_20xx' to get translated into 'Year'.
+        color_col, colormap = create_point_colormap(locations_to_map, 
+        timestamp_column_name, color_points_by, colormap_color_range)
     
-    if add_paths == True:
-        g = Geod(ellps="WGS84")
-        # From https://pyproj4.github.io/pyproj/stable/api/geod.html
-
-        # The following for loop adds lines in between
-        # different points on the map. This loop runs first
-        # so that the lines won't appear on top of the markers.
-
-        # This loop creates lines by generating a series of points that can 
-        # be plotted on the map. A simple solution would be to simply draw a 
-        # straight line in between the two points. However, this has two issues:
-        # 1. The paths between far-apart points are influenced by the curvature
-        # of the Earth, so plotting linear lines would be unrealistic.
-        # 2. US-to-East-Asia paths would be plotted eastbound rather than 
-        # westbound, which is extremely unrealistic.
-        # Therefore, the following set of code uses the pyproj library to create
-        # great circle paths (e.g. paths that curve along with the Earth)
-        # to better represent the actual paths between points. This may also
-        # make it easier to plot trans-Pacific paths.
-        # However, Folium cuts off lines once they hit the international 
-        # date line. To resolve this issue, I needed to create a new cutoff
-        # point ('longitude_cutoff') and then subtract 360 from 
-        # longitude values that exceeded these coordinates. This ensured 
-        # that paths east of this point (e.g. places east of Central India) 
-        # would appear on the left of the map rather than on the right.
-
-        for i in range(1, len(locations_to_map)):
-            # To plot lines between points, the function first obtains 
-            # the geographic coordinates of the current row and 
-            # the previous row (which is why it's crucial for the DataFrame
-            # passed to this function to have the points in the correct order). 
-            lat = locations_to_map.iloc[i, lat_column]
-            lon = locations_to_map.iloc[i, lon_column]
-
-            prev_lat = locations_to_map.iloc[
-                i-1, locations_to_map.columns.get_loc('lat')]           
-            prev_lon = locations_to_map.iloc[
-                i -1, locations_to_map.columns.get_loc('lon')]
-
-            if (lat == prev_lat) & (lon == prev_lon):
-                continue # If this row's points are the same as the last row's,
-                # there's no need to attempt to draw a line between them.
-            if lon > longitude_cutoff: # See above for explanation
-                mapped_lon = lon - 360
-            else:
-                mapped_lon = lon
-        # This method of reducing far-east longitude points by 360 is based on
-        # the response by 'mourner' at:
-        # https://github.com/Leaflet/Leaflet/issues/82#issuecomment-1260488
-
-
-            if prev_lon > longitude_cutoff:
-                mapped_prev_lon = prev_lon - 360
-            else:
-                mapped_prev_lon = prev_lon
-
-
-        # The following code uses pyproj to create a list of
-        # great circle ('gc') points
-        # that produce curvilinear paths, which are both more accurate
-        # and more aesthetically pleasing than straight paths. From:
-        # https://pyproj4.github.io/pyproj/stable/api/geod.html?highlight=npts#pyproj.Geod.npts
-
-            gc_points = g.npts(mapped_prev_lon, prev_lat,
-                mapped_lon, lat, 20, initial_idx = 0, terminus_idx = 0)
-                # Creates 20 points for each line
-                # See documentation at:
-                # https://pyproj4.github.io/pyproj/stable/api/geod.html
-
-            flipped_gc_points = ([(coords[1], coords[0]-360) 
-            if coords[0] > longitude_cutoff else (coords[1], coords[0])
-            for coords in gc_points]) 
- 
-            # # The coordinates in gc_points are stored in (longitude, latitude)
-            # format, so the above list comprehension flips them back into
-            # (latitude, longitude) format for plotting. It also modifies
-            # points above the longitude cutoff so that they appear on the
-            # right side of the map, resulting in more accurate paths.
-          
+    if layer_period is not None:
+        # Each point's layer label (e.g. '2024' or '2024-06'):
+        period_labels = get_period_labels(
+            locations_to_map[timestamp_column_name], layer_period)
+        period_points = {period: [] for period in period_labels.unique()}
+
+    if add_paths == True and layer_period is None:
+        # Adding lines in between the points on the map. This step
+        # runs first so that the lines won't appear on top of the markers.
+        # (When layer_period is specified, paths are instead saved 
+        # within each layer's data file.)
+        for flipped_gc_points in generate_great_circle_paths(
+        locations_to_map, longitude_cutoff):
             folium.PolyLine(flipped_gc_points, color = path_color,
             weight = path_weight).add_to(m) 
 
@@ -720,31 +1950,50 @@ show_colormap = True):
         # HTML code underlying the maps. Therefore, the following line replaces
         # any backslashes in the file paths with forward slashes.
         modified_fp = file_path.replace('\\', '/')
+        popup = modified_fp
+        popup_html = modified_fp
+        if show_thumbnails == True:
+            thumbnail_id = locations_to_map.iloc[i, thumbnail_id_column]
+            if thumbnail_id in thumbnail_store:
+                # The thumbnail's path is stored within data-src rather
+                # than src so that the browser won't load it until the 
+                # popup is opened. (See add_lazy_thumbnail_loader.)
+                popup_html = f'<img data-src="\
+{thumbnail_folder_name}/{thumbnail_id}.jpg" width="{thumbnail_width}">\
+<br>{modified_fp}'
+                popup = folium.Popup(popup_html, 
+                max_width = thumbnail_width + 50)
         # name = locations_to_map.iloc[i, name_column] # You may choose
         # to display the name instead of the file path instead.
         # The following try block attempts to add markers to the map. If 
         # this is unsuccessful, it will instead continue to the next line
         # within the function.
         try:
-            if marker_type == 'CircleMarker':
+            # Choosing either a colormap-based color or
+            # a fixed one for our fill_color value:
+            fill_color = (colormap(locations_to_map.iloc[i][color_col]) if
+                (color_points_by != 'same') else circle_marker_color)
+            if layer_period is not None:
+                # Rather than adding this marker to the map, the function
+                # saves its details so that they can be written to its
+                # layer's data file. (See write_period_layers.)
+                period_points[period_labels.iloc[i]].append([
+                    round(float(lat), 6), round(float(mapped_lon), 6), 
+                    fill_color, tooltip, popup_html])
+            elif marker_type == 'CircleMarker':
                 folium.CircleMarker([lat,mapped_lon],
                 color = '#000000',
                 radius = radius,
                 weight = 0.5,
                 opacity = stroke_opacity,
-                # Choosing either a colormap-based color or
-                # a fixed one for our fill_color value:
-                fill_color = [
-                colormap(locations_to_map.iloc[i][color_col]) if
-                    (color_points_by != 'same')
-                    else circle_marker_color],
+                fill_color = [fill_color],
                 fill_opacity = 1.0,
                 tooltip = tooltip,
-                popup = modified_fp).add_to(m)
+                popup = popup).add_to(m)
             else:
                 folium.Marker([lat,mapped_lon],
                 tooltip = tooltip,
-                popup = modified_fp).add_to(m)
+                popup = popup).add_to(m)
 
             # See https://python-visualization.github.io/folium/modules.
             # html#folium.vector_layers.path_options
@@ -754,6 +2003,19 @@ show_colormap = True):
         except:
             continue
 
+    if layer_period is not None:
+        period_paths = (generate_period_paths(locations_to_map, 
+        period_labels, longitude_cutoff) if add_paths == True else {})
+        write_period_layers(m, period_points, period_paths, 
+        layer_folder = join(folder_path if folder_path != None else '.',
+        f'{file_name}_layers'), layer_folder_name = f'{file_name}_layers',
+        initial_layers = initial_layers, marker_type = marker_type, 
+        marker_options = {'color': '#000000', 'radius': radius, 
+        'weight': 0.5, 'opacity': stroke_opacity, 'fillOpacity': 1.0},
+        path_options = {'color': path_color, 'weight': path_weight},
+        popup_max_width = (thumbnail_width + 50 if show_thumbnails == True 
+        else 300))
+
     print("Added",marker_count,"markers to the map.")
 
     # Adding our colormap to the map:
@@ -772,6 +2034,166 @@ show_colormap = True):
         m.save(f'{file_name}_locations.html')
     return m
 
+def add_lazy_thumbnail_loader(m):
+    '''Adds a script to m (a Folium map) that, whenever a popup is 
+    opened, copies the data-src attribute of any images within that popup
+    into their src attribute (thus loading the thumbnail), then resizes
+    the popup to fit the loaded image.'''
+    from branca.element import MacroElement, Template
+    lazy_thumbnail_loader = MacroElement()
+    lazy_thumbnail_loader._template = Template('''
+    {% macro script(this, kwargs) %}
+    {{ this._parent.get_name() }}.on('popupopen', function(e) {
+        var popup = e.popup;
+        popup.getElement().querySelectorAll('img[data-src]').forEach(
+            function(image) {
+                image.onload = function() { popup.update(); };
+                image.src = image.getAttribute('data-src');
+                image.removeAttribute('data-src');
+            });
+    });
+    {% endmacro %}
+    ''')
+    m.add_child(lazy_thumbnail_loader)
+
+
+def get_period_labels(timestamps, layer_period):
+    '''Returns a Series of layer labels (e.g. '2024' if layer_period is
+    'year' or '2024-06' if layer_period is 'month') for a Series of 
+    timestamps. Missing timestamps are labeled 'undated'.'''
+    if layer_period == 'year':
+        period_labels = timestamps.dt.strftime('%Y')
+    elif layer_period == 'month':
+        period_labels = timestamps.dt.strftime('%Y-%m')
+    else:
+        raise ValueError("layer_period must be 'year', 'month', or None.")
+    return period_labels.fillna('undated')
+
+
+def generate_period_paths(locations_to_map, period_labels, 
+longitude_cutoff = 80):
+    '''Returns a dictionary whose keys are layer labels (see 
+    get_period_labels) and whose values are lists of the great circle paths
+    (see generate_great_circle_paths) between the points within each 
+    layer. Each layer's paths begin at the last point within the previous
+    layer so that consecutive layers, when shown together, form a 
+    continuous route. (Undated points don't get paths.)'''
+    period_paths = {}
+    previous_position = None
+    for period in period_labels.unique():
+        if period == 'undated':
+            continue
+        positions = list(np.flatnonzero(period_labels == period))
+        if previous_position is not None:
+            positions = [previous_position] + positions
+        period_paths[period] = [[[round(float(lat), 5), round(float(lon), 5)]
+        for lat, lon in path] for path in generate_great_circle_paths(
+            locations_to_map.iloc[positions], longitude_cutoff)]
+        previous_position = positions[-1]
+    return period_paths
+
+
+def write_period_layers(m, period_points, period_paths, layer_folder, 
+layer_folder_name, initial_layers = None, marker_type = 'CircleMarker',
+marker_options = None, path_options = None, popup_max_width = 300):
+    '''Saves the markers and paths for each layer within a separate 
+    script in layer_folder, then adds a layer control to m (a Folium map)
+    that loads each layer's script the first time that layer is switched
+    on. Called by map_media_locations when layer_period is specified.
+
+    period_points: A dictionary whose keys are layer labels and whose 
+    values are lists of [lat, lon, fill color, tooltip, popup] lists.
+
+    period_paths: A dictionary whose keys are layer labels and whose 
+    values are lists of paths (see generate_period_paths).
+
+    layer_folder_name: The path to layer_folder relative to the map.
+
+    Each layer's data is stored as a script that passes the data to a 
+    callback (rather than as a plain JSON file) because browsers won't 
+    let maps opened from the local file system fetch JSON files, but will
+    let them load scripts.
+    '''
+    from branca.element import MacroElement, Template
+    os.makedirs(layer_folder, exist_ok = True)
+    # Sorting layers chronologically, with undated points last:
+    periods = sorted(period_points, key = lambda period: (
+        period == 'undated', period))
+    for period in periods:
+        layer_data = {'points': period_points[period], 
+                      'paths': period_paths.get(period, [])}
+        with open(join(layer_folder, f'{period}.js'), 'w') as file_handle:
+            file_handle.write('media_geotag_layer_loaded(' 
+            + json.dumps(period) + ', ' + json.dumps(layer_data, 
+            separators = (',', ':')) + ');')
+    if initial_layers is None:
+        dated_periods = [period for period in periods if period != 'undated']
+        initial_layers = dated_periods[-1:] if len(dated_periods) > 0 \
+        else periods[-1:]
+
+    period_layers = MacroElement()
+    period_layers.periods = periods
+    period_layers.initial_layers = [period for period in initial_layers 
+    if period in periods]
+    period_layers.layer_folder_name = layer_folder_name.replace('\\', '/')
+    period_layers.marker_type = marker_type
+    period_layers.marker_options = marker_options or {}
+    period_layers.path_options = path_options or {}
+    period_layers.popup_max_width = popup_max_width
+    period_layers._template = Template('''
+    {% macro script(this, kwargs) %}
+    var {{ this.get_name() }} = {groups: {}, loaded: {}};
+    window.media_geotag_layer_loaded = function(period, data) {
+        var group = {{ this.get_name() }}.groups[period];
+        // Paths are added first so that they won't appear on top of 
+        // the markers.
+        data.paths.forEach(function(path) {
+            L.polyline(path, {{ this.path_options|tojson }}).addTo(group);
+        });
+        data.points.forEach(function(point) {
+            {% if this.marker_type == 'CircleMarker' %}
+            var marker = L.circleMarker([point[0], point[1]], Object.assign(
+                {fillColor: point[2]}, {{ this.marker_options|tojson }}));
+            {% else %}
+            var marker = L.marker([point[0], point[1]]);
+            {% endif %}
+            marker.bindTooltip(point[3]);
+            marker.bindPopup(point[4], 
+                {maxWidth: {{ this.popup_max_width }}});
+            marker.addTo(group);
+        });
+    };
+    function {{ this.get_name() }}_load(period) {
+        if ({{ this.get_name() }}.loaded[period]) { return; }
+        {{ this.get_name() }}.loaded[period] = true;
+        var script = document.createElement('script');
+        script.src = {{ this.layer_folder_name|tojson }} + '/' 
+            + encodeURIComponent(period) + '.js';
+        document.head.appendChild(script);
+    }
+    var {{ this.get_name() }}_control = L.control.layers(
+        null, null, {collapsed: false}).addTo({{ this._parent.get_name() }});
+    {{ this.periods|tojson }}.forEach(function(period) {
+        var group = L.featureGroup();
+        group.period = period;
+        {{ this.get_name() }}.groups[period] = group;
+        {{ this.get_name() }}_control.addOverlay(group, period);
+    });
+    {{ this._parent.get_name() }}.on('overlayadd', function(e) {
+        if (e.layer.period !== undefined) {
+            {{ this.get_name() }}_load(e.layer.period);
+        }
+    });
+    {{ this.initial_layers|tojson }}.forEach(function(period) {
+        {{ this.get_name() }}.groups[period].addTo(
+            {{ this._parent.get_name() }});
+        {{ this.get_name() }}_load(period);
+    });
+    {% endmacro %}
+    ''')
+    m.add_child(period_layers)
+
+
 def folder_list_to_map(top_folder_list, file_name, folder_path = None):
     ''' This function calls generate_media_list, generate_loc_list,
     and map_media_locations together in order to turn a list of folders
@@ -822,6 +2244,7 @@ screenshot_save_path = None, window_width = 3000):
     screenshot_save_path designates the folder where you wish to save
     the map screenshot. This can be a relative path.
     '''
+    from selenium import webdriver
 
     # Note: Some of the following code was based on similar code within
     # my Python for Nonprofits project at 
@@ -891,6 +2314,7 @@ reduction_factor = 1, quality_factor = 50):
     to a full HD (1920*1080) one, use a reduction factor of 2. If you do not
     wish to reduce the image's size, use the default reduction factor of 1.
     '''
+    import PIL.Image
     with PIL.Image.open(f'{png_folder}/{png_image_name}') as map_image:
         (width, height) = (map_image.width // reduction_factor, 
         map_image.height // reduction_factor)
@@ -919,6 +2343,276 @@ reduction_factor, quality_factor):
         convert_png_to_smaller_jpg(png_folder, png_image_name, jpg_folder,
         reduction_factor, quality_factor)
 
+def project_to_web_mercator(lats, lons, zoom):
+    '''Converts arrays of latitudes and longitudes into Web Mercator
+    pixel coordinates at the specified zoom level, which is the 
+    projection used by OpenStreetMap tiles (and therefore by Folium).
+    See https://wiki.openstreetmap.org/wiki/Slippy_map_tilenames'''
+    world_size = 256 * 2 ** zoom
+    lats = np.clip(np.asarray(lats, dtype = float), -85.05112878, 85.05112878)
+    lons = np.asarray(lons, dtype = float)
+    x = (lons + 180) / 360 * world_size
+    y = (1 - np.log(np.tan(np.radians(lats)) + 1 / np.cos(np.radians(lats))
+    ) / np.pi) / 2 * world_size
+    return x, y
+
+
+# The number of seconds to wait for a tile server to respond. (This is 
+# kept short because a map can require dozens of tiles, and a missing 
+# tile only costs a gray square.)
+TILE_DOWNLOAD_TIMEOUT = 5
+# While batch_render_static_maps is running, this set stores the tiles 
+# that couldn't be retrieved, so that every map within the batch doesn't
+# try (and wait for) each failed tile again. It's None otherwise.
+failed_map_tiles = None
+
+
+@functools.lru_cache(maxsize = 2048)
+def fetch_map_tile(tile_url, zoom, x, y, tile_cache_folder = 'tile_cache'):
+    '''Returns a basemap tile as a PIL image. Tiles are saved within 
+    tile_cache_folder after being downloaded, and recently used tiles are
+    also kept in memory, so creating a batch of maps of the same area only
+    requires each tile to be downloaded once.
+    
+    Raises an error if the tile can't be retrieved. (lru_cache doesn't 
+    cache errors, so a failed download will be retried the next time the
+    tile is requested.)'''
+    import PIL.Image
+    cache_path = None
+    if tile_cache_folder is not None:
+        cache_path = os.path.join(tile_cache_folder, 
+        re.sub(r'[^A-Za-z0-9]+', '_', tile_url.split('//')[-1].split(
+            '{')[0]), str(zoom), str(x), f'{y}.png')
+        if os.path.exists(cache_path):
+            with PIL.Image.open(cache_path) as tile:
+                return tile.convert('RGB')
+    request = urllib.request.Request(
+        tile_url.format(z = zoom, x = x, y = y),
+        headers = {'User-Agent': 'media_geotag_mapper'})
+    # OpenStreetMap's tile usage policy requires a User-Agent header.
+    # See https://operations.osmfoundation.org/policies/tiles/
+    with urllib.request.urlopen(request, 
+    timeout = TILE_DOWNLOAD_TIMEOUT) as response:
+        tile_bytes = response.read()
+    tile = PIL.Image.open(io.BytesIO(tile_bytes)).convert('RGB')
+    if cache_path is not None:
+        os.makedirs(os.path.dirname(cache_path), exist_ok = True)
+        with open(cache_path, 'wb') as cache_file:
+            cache_file.write(tile_bytes)
+    return tile
+
+
+def load_map_tile(tile_url, zoom, x, y, tile_cache_folder = 'tile_cache'):
+    '''Returns a basemap tile as a PIL image via fetch_map_tile. If the 
+    tile can't be retrieved, a blank gray tile is returned instead. This 
+    placeholder isn't cached, so a temporary network error won't leave
+    the tile blank within every later map. (Within a batch, though, failed
+    tiles aren't requested again; see batch_render_static_maps.)'''
+    import PIL.Image
+    tile_key = (tile_url, zoom, x, y)
+    if failed_map_tiles is None or tile_key not in failed_map_tiles:
+        try:
+            return fetch_map_tile(tile_url, zoom, x, y, 
+            tile_cache_folder = tile_cache_folder)
+        except Exception as e:
+            print(f"Unable to retrieve tile {zoom}/{x}/{y}: {e}")
+            if failed_map_tiles is not None:
+                failed_map_tiles.add(tile_key)
+    return PIL.Image.new('RGB', (256, 256), (221, 221, 221))
+
+
+def render_static_map(df_locations, file_name, folder_path = None, 
+add_paths = False, starting_location = None, zoom_start = None,
+width = 1920, height = 1080,
+timestamp_column_name = 'utc_metadata_creation_time', longitude_cutoff = 80,
+circle_marker_color = '#ff0000', radius = 5, path_color = '#3388ff', 
+path_weight = 3, 
+tile_url = 'https://tile.openstreetmap.org/{z}/{x}/{y}.png',
+attribution = '© OpenStreetMap contributors', 
+tile_cache_folder = 'tile_cache', color_points_by = 'year_20xx', 
+colormap_color_range = ['red', 'blue'], show_colormap = True,
+image_format = 'png', quality_factor = 50):
+    '''This function creates a static image of a map without needing to
+    create an HTML file, launch a browser, and take a screenshot (as
+    map_media_locations and create_map_screenshot do). It projects each
+    geotag onto the Web Mercator projection, stitches together the basemap
+    tiles that the image covers, then draws paths, markers, and a legend
+    directly onto the image. 
+
+    Most arguments work the same way as in map_media_locations, and
+    points are colored the same way. Additional arguments include:
+
+    starting_location and zoom_start: The center and zoom level of the
+    image. If either is set to None, it will be chosen so that all points
+    fit within the image.
+
+    width and height: The dimensions of the image in pixels.
+
+    tile_url: The URL template from which basemap tiles will be 
+    retrieved. attribution: The text that will be shown in the bottom
+    right corner of the image. (Most tile providers require attribution.)
+
+    tile_cache_folder: The folder in which downloaded tiles will be 
+    stored. Set to None to keep tiles in memory only.
+
+    image_format: 'png' or 'jpg'. quality_factor only applies to .jpg 
+    images (see convert_png_to_smaller_jpg).
+
+    The image is saved as f'{file_name}_locations.{image_format}' (the
+    same name that create_map_screenshot would have used) within 
+    folder_path (or the current folder, if folder_path is None). The 
+    function also returns the image as a PIL Image object.
+    '''
+    import PIL.Image
+    import PIL.ImageColor
+    import PIL.ImageDraw
+    import PIL.ImageFont
+    locations_to_map = df_locations.query("lat != 0 & lon != 0").sort_values(
+    timestamp_column_name).reset_index(drop=True).copy()
+    locations_to_map['sort_order'] = locations_to_map.index + 1
+    if color_points_by != 'same' and len(locations_to_map) > 0:
+        color_col, colormap = create_point_colormap(locations_to_map,
+        timestamp_column_name, color_points_by, colormap_color_range)
+    else:
+        show_colormap = False
+
+    lats = locations_to_map['lat'].to_numpy(dtype = float)
+    lons = locations_to_map['lon'].to_numpy(dtype = float)
+    mapped_lons = np.where(lons > longitude_cutoff, lons - 360, lons)
+    path_list = (generate_great_circle_paths(locations_to_map, 
+    longitude_cutoff) if add_paths == True else [])
+
+    # Choosing a zoom level (if needed) by finding the highest level at 
+    # which all points (with a 5% margin) still fit within the image.
+    if zoom_start is None:
+        zoom_start = 2
+        if len(lats) > 0:
+            for candidate_zoom in range(18, 0, -1):
+                x, y = project_to_web_mercator(lats, mapped_lons, 
+                candidate_zoom)
+                if ((x.max() - x.min()) <= width * 0.9) and (
+                (y.max() - y.min()) <= height * 0.9):
+                    zoom_start = candidate_zoom
+                    break
+    if starting_location is None:
+        if len(lats) > 0:
+            x, y = project_to_web_mercator(lats, mapped_lons, zoom_start)
+            center_x, center_y = (x.min() + x.max()) / 2, (
+                y.min() + y.max()) / 2
+        else:
+            center_x, center_y = project_to_web_mercator(
+                [39], [-95], zoom_start)
+    else:
+        center_x, center_y = project_to_web_mercator(
+            [starting_location[0]], [starting_location[1]], zoom_start)
+    center_x, center_y = float(np.squeeze(center_x)), float(
+        np.squeeze(center_y))
+    left = center_x - width / 2
+    top = center_y - height / 2
+
+    # Stitching together the basemap tiles. Tiles are wrapped 
+    # horizontally (since longitudes below -180, which result from 
+    # longitude_cutoff, fall to the left of tile 0).
+    tile_count = 2 ** zoom_start
+    map_image = PIL.Image.new('RGB', (width, height), (221, 221, 221))
+    for tile_x in range(int(np.floor(left / 256)), 
+    int(np.floor((left + width) / 256)) + 1):
+        for tile_y in range(int(np.floor(top / 256)), 
+        int(np.floor((top + height) / 256)) + 1):
+            if (tile_y < 0) or (tile_y >= tile_count):
+                continue
+            tile = load_map_tile(tile_url, zoom_start, tile_x % tile_count,
+            tile_y, tile_cache_folder)
+            map_image.paste(tile, (int(round(tile_x * 256 - left)), 
+            int(round(tile_y * 256 - top))))
+
+    draw = PIL.ImageDraw.Draw(map_image, 'RGBA')
+    path_rgb = PIL.ImageColor.getrgb(path_color)
+    for path_points in path_list:
+        path_lats, path_lons = zip(*path_points)
+        x, y = project_to_web_mercator(path_lats, path_lons, zoom_start)
+        draw.line(list(zip(x - left, y - top)), fill = path_rgb, 
+        width = path_weight, joint = 'curve')
+
+    # Drawing markers (with the same black outline used within 
+    # map_media_locations' CircleMarkers):
+    x, y = project_to_web_mercator(lats, mapped_lons, zoom_start)
+    x = x - left
+    y = y - top
+    outline_alpha = int(255 * min(radius / 5, 1))
+    for i in range(len(locations_to_map)):
+        if color_points_by != 'same':
+            fill_color = PIL.ImageColor.getrgb(colormap(
+                locations_to_map.iloc[i][color_col]))
+        else:
+            fill_color = PIL.ImageColor.getrgb(circle_marker_color)
+        draw.ellipse([x[i] - radius, y[i] - radius, x[i] + radius, 
+        y[i] + radius], fill = fill_color, 
+        outline = (0, 0, 0, outline_alpha), width = 1)
+    print("Added", len(locations_to_map), "markers to the map.")
+
+    font = PIL.ImageFont.load_default()
+    if show_colormap == True:
+        # Drawing a stepped legend that resembles branca's colormap
+        # within the top right corner of the image.
+        legend_width = min(400, width // 3)
+        legend_left = width - legend_width - 20
+        step_width = legend_width / len(colormap.colors)
+        draw.rectangle([legend_left - 10, 10, width - 10, 70], 
+        fill = (255, 255, 255, 200))
+        draw.text((legend_left, 14), colormap.caption, fill = (0, 0, 0),
+        font = font)
+        for step, step_color in enumerate(colormap.colors):
+            draw.rectangle([legend_left + step * step_width, 32, 
+            legend_left + (step + 1) * step_width, 48], 
+            fill = tuple(int(255 * value) for value in step_color))
+        draw.text((legend_left, 52), str(round(colormap.vmin, 2)), 
+        fill = (0, 0, 0), font = font)
+        vmax_label = str(round(colormap.vmax, 2))
+        draw.text((width - 20 - draw.textlength(vmax_label, font = font), 
+        52), vmax_label, fill = (0, 0, 0), font = font)
+
+    if attribution:
+        attribution_width = draw.textlength(attribution, font = font)
+        draw.rectangle([width - attribution_width - 10, height - 18, width,
+        height], fill = (255, 255, 255, 200))
+        draw.text((width - attribution_width - 5, height - 16), attribution,
+        fill = (0, 0, 0), font = font)
+
+    image_name = f'{file_name}_locations.{image_format}'
+    if folder_path is not None:
+        image_name = f'{folder_path}/{image_name}'
+    if image_format == 'jpg':
+        map_image.save(image_name, format = 'JPEG', 
+        quality = quality_factor, optimize = True)
+    else:
+        map_image.save(image_name)
+    return map_image
+
+
+def batch_render_static_maps(location_dict, folder_path = None, 
+**render_kwargs):
+    '''This function applies render_static_map to each DataFrame within
+    location_dict, whose keys are the file names that should be used for
+    each image. (For instance, location_dict could map '2019_combined' to
+    a DataFrame of 2019 geotags.) Any additional keyword arguments will be 
+    passed to render_static_map. Because tiles are cached (see 
+    load_map_tile), tiles shared across maps are only retrieved once.
+    
+    Tiles that can't be retrieved are only attempted once per batch (and 
+    are left blank within all of the batch's maps); they'll be requested
+    again the next time this function or render_static_map is called.'''
+    global failed_map_tiles
+    failed_map_tiles = set()
+    try:
+        for file_name, df_locations in location_dict.items():
+            print(f"Rendering {file_name}:")
+            render_static_map(df_locations, file_name = file_name, 
+            folder_path = folder_path, **render_kwargs)
+    finally:
+        failed_map_tiles = None
+
+
 def calculate_distance_by_year(df_locations, unit = 'miles', 
     timestamp_column = 'utc_metadata_creation_time'):
     '''This function uses the geographic coordinate information within
@@ -926,6 +2620,7 @@ def calculate_distance_by_year(df_locations, unit = 'miles',
     that the rows in df_locations are sorted in chronological order. 
     Otherwise, it will likely overestimate your travel distance by a large
     extent.'''
+    from haversine import haversine, Unit
     df = df_locations.copy()
     df['distance'] = 0.0
     lat_col = df.columns.get_loc('lat')
@@ -963,4 +2658,1221 @@ Using kilometers as the distance measure.")
     df_stats_by_year.rename(columns={'lat':'geotags',
     'distance':'total_distance'}, inplace = True)
     df_stats_by_year.reset_index(inplace=True)
-    return df_stats_by_year
\ No newline at end of file
+    return df_stats_by_year
+
+def segment_trips(df_locations, home_lat, home_lon, home_radius = 50,
+    max_gap_hours = 48, max_speed = 650, unit = 'miles',
+    timestamp_column = 'utc_metadata_creation_time'):
+    '''This function splits a location DataFrame (such as one created by
+    generate_loc_list) into trips and stays. It does so in a single
+    vectorized pass over the time-sorted geotags, thus making it
+    unnecessary to hard-code a start and end time for each trip.
+
+    Each geotag is first classified as 'home' or 'away' based on its
+    distance from (home_lat, home_lon). A new segment then begins whenever
+    this status changes or whenever the gap between two consecutive
+    geotags exceeds max_gap_hours. Runs of 'away' geotags become 'trip'
+    segments, and runs of 'home' geotags become 'stay' segments.
+
+    home_lat and home_lon: The coordinates (in decimal degrees) of the
+    center of your home region.
+
+    home_radius: Geotags within this distance of the home coordinates
+    will be considered part of your home region.
+
+    max_gap_hours: The maximum number of hours that can pass between two
+    consecutive geotags before a new segment gets started.
+
+    max_speed: The maximum plausible speed (in units per hour) between
+    consecutive geotags. A geotag whose incoming and outgoing speeds both
+    exceed this value (i.e. a single point that jumps far away from its 
+    neighbors and then back) will be flagged as a speed outlier. Outliers
+    inherit the status of the previous geotag so that they can't start
+    a trip of their own, and they're excluded from distance and
+    bounding box calculations.
+
+    unit: 'miles' or 'kilometers'.
+
+    This function returns two DataFrames:
+    1. df_segmented: A copy of the valid (e.g. non-Null-Island and
+    timestamped) rows in df_locations, sorted chronologically, with
+    segment_id, segment_type, distance_from_home, speed, and speed_outlier
+    columns added in.
+    2. df_segments: One summary row per segment with its start and end times,
+    bounding box, distance traveled, and file count.
+    '''
+    from haversine import haversine_vector, Unit
+    if unit == 'miles':
+        haversine_unit = Unit.MILES
+    else:
+        if unit != 'kilometers':
+            print("This function supports miles and kilometers for units. \
+Using kilometers as the distance measure.")
+        haversine_unit = Unit.KILOMETERS
+
+    df = df_locations[(df_locations['lat'] != 0) 
+    & (df_locations['lon'] != 0) 
+    & (df_locations[timestamp_column].notna())].sort_values(
+        timestamp_column, kind = 'stable').reset_index(drop=True).copy()
+    # A stable sort is used so that files with identical timestamps 
+    # will retain their original order.
+
+    coords = df[['lat', 'lon']].to_numpy()
+    row_count = len(coords)
+
+    df['distance_from_home'] = haversine_vector(
+        coords, np.tile([home_lat, home_lon], (row_count, 1)),
+        haversine_unit) if row_count > 0 else 0.0
+    # See https://github.com/mapado/haversine#performance-optimisation-for-distances-between-all-points-in-two-vectors
+    # for documentation on haversine_vector.
+
+    gap_hours = df[timestamp_column].diff().dt.total_seconds().to_numpy(
+        ) / 3600
+    gap_hours[0:1] = 0.0 # The first row has no previous geotag.
+
+    step_distances = np.zeros(row_count)
+    if row_count > 1:
+        step_distances[1:] = haversine_vector(coords[:-1], coords[1:],
+        haversine_unit)
+
+    # Calculating the speed between each geotag and the one before it.
+    # Geotags with identical timestamps but different coordinates get
+    # an infinite speed.
+    speeds = np.divide(step_distances, gap_hours,
+        out = np.where(step_distances > 0, np.inf, 0.0),
+        where = gap_hours > 0)
+    df['speed'] = speeds
+    next_speeds = np.append(speeds[1:], 0.0)
+    df['speed_outlier'] = (speeds > max_speed) & (next_speeds > max_speed)
+
+    # Determining each geotag's home/away status. Outliers are assigned
+    # a missing value that then gets filled in with the status of the
+    # preceding geotag.
+    away = (df['distance_from_home'] > home_radius).astype(float)
+    away[df['speed_outlier']] = np.nan
+    away = away.ffill().fillna(0).astype(bool)
+
+    new_segment = (away != away.shift()) | (gap_hours > max_gap_hours)
+    df['segment_id'] = new_segment.cumsum().astype(int) - 1
+    df['segment_type'] = np.where(away, 'trip', 'stay')
+
+    # Recalculating step distances using only the non-outlier geotags
+    # so that a single bad coordinate won't add thousands of miles to
+    # a segment. The distance between segments (e.g. the flight home from a
+    # trip) isn't assigned to either segment.
+    valid = ~df['speed_outlier'].to_numpy()
+    valid_coords = coords[valid]
+    valid_step_distances = np.zeros(len(valid_coords))
+    if len(valid_coords) > 1:
+        valid_step_distances[1:] = haversine_vector(
+            valid_coords[:-1], valid_coords[1:], haversine_unit)
+    valid_segment_ids = df['segment_id'].to_numpy()[valid]
+    valid_step_distances[1:][
+        valid_segment_ids[1:] != valid_segment_ids[:-1]] = 0.0
+    segment_distances = np.zeros(row_count)
+    segment_distances[valid] = valid_step_distances
+
+    df_summary_source = pd.DataFrame({
+        'segment_id': df['segment_id'],
+        'segment_type': df['segment_type'],
+        'start_time': df[timestamp_column],
+        'end_time': df[timestamp_column],
+        'south': df['lat'].where(valid),
+        'north': df['lat'].where(valid),
+        'west': df['lon'].where(valid),
+        'east': df['lon'].where(valid),
+        'distance': segment_distances,
+        'file_count': 1})
+    df_segments = df_summary_source.groupby('segment_id').agg({
+        'segment_type': 'first', 'start_time': 'min', 'end_time': 'max',
+        'south': 'min', 'north': 'max', 'west': 'min', 'east': 'max',
+        'distance': 'sum', 'file_count': 'sum'}).reset_index()
+    # See https://pandas.pydata.org/docs/reference/api/pandas.core.groupby.DataFrameGroupBy.agg.html
+    df_segments['duration_hours'] = (df_segments['end_time'] 
+    - df_segments['start_time']).dt.total_seconds() / 3600
+
+    return df, df_segments
+
+
+def batch_map_segments(df_segmented, df_segments, folder_path = None,
+    segment_types = ['trip'], min_file_count = 2, file_name_suffix = 'trip',
+    add_paths = True, **map_kwargs):
+    '''This function creates one map for each segment returned by 
+    segment_trips. Rather than filtering the full location table once for
+    each map, it groups df_segmented by segment_id once and then maps each
+    group in turn.
+
+    segment_types: The segment types ('trip' and/or 'stay') to map.
+
+    min_file_count: Segments with fewer files than this value will be
+    skipped.
+
+    file_name_suffix: Each map will be named after the start date of its
+    segment, its segment ID, and this suffix (e.g. 
+    '2022-03-14_12_trip_locations.html').
+
+    Any additional keyword arguments (e.g. tiles or color_points_by) will
+    be passed to map_media_locations.
+
+    Returns a dictionary whose keys are segment IDs and whose values are
+    the corresponding Folium maps.
+    '''
+    segments_to_map = df_segments.query(
+        "segment_type in @segment_types & file_count >= @min_file_count"
+        ).set_index('segment_id')
+    segment_map_dict = {}
+    for segment_id, df_segment in df_segmented.groupby('segment_id'):
+        if segment_id not in segments_to_map.index:
+            continue
+        segment = segments_to_map.loc[segment_id]
+        # Centering the map on the segment's bounding box and choosing a 
+        # zoom level that (roughly) fits the entire box on the screen:
+        starting_location = [(segment['south'] + segment['north']) / 2,
+        (segment['west'] + segment['east']) / 2]
+        extent = max(segment['north'] - segment['south'],
+        segment['east'] - segment['west'], 0.01)
+        zoom_start = int(np.clip(np.floor(np.log2(360 / extent)), 2, 14))
+        file_name = (segment['start_time'].strftime('%Y-%m-%d') + '_' 
+        + str(segment_id) + '_' + file_name_suffix)
+        print(f"Creating map for segment {segment_id} ({file_name}):")
+        segment_map_dict[segment_id] = map_media_locations(df_segment,
+            file_name = file_name, folder_path = folder_path,
+            add_paths = add_paths, starting_location = starting_location,
+            zoom_start = zoom_start, **map_kwargs)
+    return segment_map_dict
+
+
+class MediaLocationIndex:
+    '''This class allows time-range and bounding-box subsets of a location
+    DataFrame (such as one created by generate_loc_list) to be retrieved
+    without scanning and parsing the entire DataFrame for every subset.
+    It's meant to be built once, then queried many times (e.g. when 
+    creating maps for each year, trip, or region).
+
+    Geotags are sorted by timestamp_column so that time ranges can be 
+    found via a binary search. In addition, each geotag is assigned to a
+    grid cell that is cell_size degrees wide and tall; bounding-box and
+    radius queries then only need to check the geotags within the cells
+    that overlap the requested area.
+
+    Every query method returns a chronologically sorted subset of the
+    original DataFrame (with its original index and columns), so the output
+    can be passed directly to map_media_locations and
+    calculate_distance_by_year.
+
+    Example:
+    location_index = MediaLocationIndex(df_locations)
+    df_2019 = location_index.time_range('2019-01-01', '2020-01-01')
+    df_colorado = location_index.bounding_box(37, 41, -109, -102)
+    '''
+
+    def __init__(self, df_locations, 
+    timestamp_column = 'utc_metadata_creation_time', cell_size = 1.0,
+    exclude_null_island = True):
+        '''exclude_null_island: If True, geotags at (0, 0) (which represent
+        files without location data) will be left out of the index, just as
+        they are left out of maps.'''
+        self.timestamp_column = timestamp_column
+        self.cell_size = cell_size
+        if exclude_null_island == True:
+            df_locations = df_locations[(df_locations['lat'] != 0) 
+            & (df_locations['lon'] != 0)]
+        self.df = df_locations.sort_values(timestamp_column, 
+        kind = 'stable', na_position = 'last')
+
+        # Rows without a timestamp are placed at the end of self.df, so
+        # only the first timestamp_count rows can be matched by time
+        # range queries.
+        timestamps = self.df[timestamp_column]
+        self.timestamp_count = int(timestamps.notna().sum())
+        self.timestamps = timestamps.iloc[
+            :self.timestamp_count].to_numpy(dtype = 'datetime64[ns]')
+
+        self.lats = self.df['lat'].to_numpy(dtype = float)
+        self.lons = self.df['lon'].to_numpy(dtype = float)
+
+        # Building the grid: each row's position within self.df is 
+        # stored alongside the other positions in its cell. Sorting the 
+        # positions by cell allows each cell to be represented as a slice
+        # of cell_positions.
+        cell_rows = np.floor(self.lats / cell_size).astype(np.int64)
+        cell_cols = np.floor(self.lons / cell_size).astype(np.int64)
+        cell_keys = cell_rows * 1000000 + cell_cols
+        # (This key format assumes that cell_size is at least 0.001
+        # degrees, which keeps each column number below 500,000.)
+        self.cell_positions = np.argsort(cell_keys, kind = 'stable')
+        unique_keys, cell_starts, cell_counts = np.unique(
+            cell_keys[self.cell_positions], return_index = True, 
+            return_counts = True)
+        self.cell_rows = np.floor_divide(unique_keys + 500000, 1000000)
+        self.cell_cols = unique_keys - self.cell_rows * 1000000
+        self.cell_starts = cell_starts
+        self.cell_ends = cell_starts + cell_counts
+
+    def __len__(self):
+        return len(self.df)
+
+    def _to_datetime64(self, value):
+        '''Converts a timestamp (or a timestamp-like string) into a 
+        timezone-naive UTC datetime64 value that can be compared with
+        self.timestamps. Timezone-naive inputs are assumed to be in UTC.'''
+        timestamp = pd.Timestamp(value)
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.tz_localize('UTC')
+        return timestamp.tz_convert('UTC').tz_localize(None).to_datetime64(
+            ).astype('datetime64[ns]')
+
+    def _time_positions(self, start = None, end = None):
+        '''Returns the first and last (exclusive) positions of the rows whose
+        timestamps fall within [start, end).'''
+        first = 0 if start is None else int(np.searchsorted(
+            self.timestamps, self._to_datetime64(start), side = 'left'))
+        last = self.timestamp_count if end is None else int(np.searchsorted(
+            self.timestamps, self._to_datetime64(end), side = 'left'))
+        return first, max(first, last)
+
+    def _bbox_positions(self, south, north, west, east):
+        '''Returns the sorted positions of all rows within the bounding box.
+        If west is greater than east, the box is assumed to cross the 
+        antimeridian.'''
+        if west > east:
+            return np.union1d(self._bbox_positions(south, north, west, 180),
+            self._bbox_positions(south, north, -180, east))
+        row_min = np.floor(south / self.cell_size)
+        row_max = np.floor(north / self.cell_size)
+        col_min = np.floor(west / self.cell_size)
+        col_max = np.floor(east / self.cell_size)
+        matching_cells = np.flatnonzero(
+            (self.cell_rows >= row_min) & (self.cell_rows <= row_max) 
+            & (self.cell_cols >= col_min) & (self.cell_cols <= col_max))
+        if len(matching_cells) == 0:
+            return np.array([], dtype = np.int64)
+        candidates = np.concatenate([self.cell_positions[
+            self.cell_starts[cell]:self.cell_ends[cell]] 
+            for cell in matching_cells])
+        # Cells along the edge of the box may extend beyond it, so the
+        # candidates still need to be checked individually.
+        candidates = candidates[(self.lats[candidates] >= south) 
+        & (self.lats[candidates] <= north) & (self.lons[candidates] >= west)
+        & (self.lons[candidates] <= east)]
+        return np.sort(candidates)
+
+    def time_range(self, start = None, end = None):
+        '''Returns all geotags whose timestamps are greater than or equal
+        to start and less than end. Either bound can be set to None.'''
+        first, last = self._time_positions(start, end)
+        return self.df.iloc[first:last]
+
+    def year(self, year):
+        '''Returns all geotags from the specified (UTC) year.'''
+        return self.time_range(f'{year}-01-01', f'{year+1}-01-01')
+
+    def bounding_box(self, south, north, west, east, start = None, 
+    end = None):
+        '''Returns all geotags within the bounding box defined by south,
+        north, west, and east (in decimal degrees). If start and/or end
+        are provided, the results will also be limited to that time range.'''
+        positions = self._bbox_positions(south, north, west, east)
+        if (start is not None) or (end is not None):
+            first, last = self._time_positions(start, end)
+            positions = positions[(positions >= first) & (positions < last)]
+        return self.df.iloc[positions]
+
+    def radius(self, lat, lon, radius, unit = 'miles', start = None, 
+    end = None):
+        '''Returns all geotags within radius miles (or kilometers, if unit
+        is set to 'kilometers') of (lat, lon). start and end work the same
+        way as in bounding_box.'''
+        from haversine import haversine_vector, Unit
+        haversine_unit = Unit.MILES if unit == 'miles' else Unit.KILOMETERS
+        # One degree of latitude is roughly 69 miles (or 111 kilometers);
+        # a slightly smaller value is used here so that the box will 
+        # always contain the full circle.
+        lat_extent = radius / (68.7 if unit == 'miles' else 110.5)
+        south = max(lat - lat_extent, -90)
+        north = min(lat + lat_extent, 90)
+        if (north >= 90) or (south <= -90):
+            west, east = -180, 180
+        else:
+            lon_extent = lat_extent / np.cos(np.radians(max(abs(south),
+            abs(north))))
+            if lon_extent >= 180:
+                west, east = -180, 180
+            else:
+                west = ((lon - lon_extent + 180) % 360) - 180
+                east = ((lon + lon_extent + 180) % 360) - 180
+        positions = self._bbox_positions(south, north, west, east)
+        if (start is not None) or (end is not None):
+            first, last = self._time_positions(start, end)
+            positions = positions[(positions >= first) & (positions < last)]
+        if len(positions) > 0:
+            distances = haversine_vector(np.column_stack(
+                [self.lats[positions], self.lons[positions]]),
+                np.tile([lat, lon], (len(positions), 1)), haversine_unit)
+            positions = positions[distances <= radius]
+        return self.df.iloc[positions]
+
+
+# The following functions extract GPS tracks that some cameras (e.g. GoPros,
+# 360-degree cameras, and dashcams) embed within their video files as 
+# timed metadata. Unlike retrieve_clip_locations, which stores a single
+# location per clip, these functions can store one point per second
+# (or per sample_interval seconds) of video.
+
+# These tracks live within MP4/MOV files, which are made up of nested 
+# 'boxes' (also known as 'atoms'). Each box begins with a 4-byte size
+# and a 4-byte type. The functions below jump from box header to box
+# header via seek() calls, so the (very large) video and audio data
+# within each file never needs to be read. For more on this format, see
+# https://developer.apple.com/documentation/quicktime-file-format
+
+# The sample description formats below map to the parsers that handle them:
+# 'gpmd' is GoPro's GPMF format (https://github.com/gopro/gpmf-parser);
+# 'camm' is the Camera Motion Metadata format
+# (https://developers.google.com/streetview/publish/camm-spec);
+# and 'tx3g'/'text' tracks are text (subtitle) tracks, which some dashcams
+# use to store NMEA GPS sentences.
+GPS_TRACK_SAMPLE_FORMATS = {'gpmd': 'gpmf', 'camm': 'camm', 
+'tx3g': 'nmea', 'text': 'nmea'}
+
+NMEA_SENTENCE_PATTERN = re.compile(
+    r'\$G[PNL](RMC|GGA),([^*\r\n$]*)')
+
+GPMF_STRUCT_FORMATS = {'b': 'b', 'B': 'B', 's': 'h', 'S': 'H', 'l': 'i', 
+'L': 'I', 'f': 'f', 'd': 'd', 'j': 'q', 'J': 'Q'}
+
+
+def iterate_mp4_boxes(file_handle, start, end):
+    '''Yields the type, payload start position, and end position of 
+    each box found between start and end within an MP4/MOV file.
+    Only box headers are read.'''
+    position = start
+    while position + 8 <= end:
+        file_handle.seek(position)
+        header = file_handle.read(8)
+        if len(header) < 8:
+            break
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1: # A 64-bit size follows the box type.
+            size = struct.unpack('>Q', file_handle.read(8))[0]
+            header_size = 16
+        elif size == 0: # This box extends to the end of its parent.
+            size = end - position
+        if size < header_size: # The file is probably corrupt.
+            break
+        yield (box_type.decode('latin-1'), position + header_size, 
+        min(position + size, end))
+        position += size
+
+
+def find_mp4_box(file_handle, start, end, box_path):
+    '''Returns the payload start and end positions of the first box
+    matching box_path (a list of nested box types, such as 
+    ['mdia', 'minf', 'stbl']), or None if no such box exists.'''
+    for box_type, payload_start, box_end in iterate_mp4_boxes(
+    file_handle, start, end):
+        if box_type == box_path[0]:
+            if len(box_path) == 1:
+                return payload_start, box_end
+            return find_mp4_box(file_handle, payload_start, box_end, 
+            box_path[1:])
+    return None
+
+
+def read_mp4_box(file_handle, box_position):
+    '''Reads the payload of a box whose position was returned by 
+    find_mp4_box.'''
+    if box_position is None:
+        return None
+    file_handle.seek(box_position[0])
+    return file_handle.read(box_position[1] - box_position[0])
+
+
+def read_gps_sample_table(file_handle, trak_start, trak_end):
+    '''Checks whether a 'trak' box contains a supported GPS track. If so,
+    returns the track's parser name along with a list of 
+    (start_seconds, duration_seconds, file_offset, size) tuples for each
+    of its samples; otherwise, returns None. The sample tables of video
+    and audio tracks are never read.'''
+    stbl = find_mp4_box(file_handle, trak_start, trak_end, 
+    ['mdia', 'minf', 'stbl'])
+    if stbl is None:
+        return None
+    stsd = read_mp4_box(file_handle, find_mp4_box(
+        file_handle, stbl[0], stbl[1], ['stsd']))
+    if (stsd is None) or (len(stsd) < 16):
+        return None
+    sample_format = stsd[12:16].decode('latin-1')
+    if sample_format not in GPS_TRACK_SAMPLE_FORMATS:
+        return None
+
+    mdhd = read_mp4_box(file_handle, find_mp4_box(
+        file_handle, trak_start, trak_end, ['mdia', 'mdhd']))
+    # The timescale (e.g. the number of time units per second) comes after
+    # the creation and modification times, whose size depends on the
+    # version of the mdhd box.
+    if mdhd[0] == 1:
+        timescale = struct.unpack('>I', mdhd[20:24])[0]
+    else:
+        timescale = struct.unpack('>I', mdhd[12:16])[0]
+    
+    stts, stsc, stsz = [read_mp4_box(file_handle, find_mp4_box(
+        file_handle, stbl[0], stbl[1], [box_type])) 
+        for box_type in ['stts', 'stsc', 'stsz']]
+    co64 = find_mp4_box(file_handle, stbl[0], stbl[1], ['co64'])
+    if co64 is not None:
+        chunk_table = read_mp4_box(file_handle, co64)
+        chunk_count = struct.unpack('>I', chunk_table[4:8])[0]
+        chunk_offsets = struct.unpack(f'>{chunk_count}Q', 
+        chunk_table[8:8 + 8 * chunk_count])
+    else:
+        chunk_table = read_mp4_box(file_handle, find_mp4_box(
+            file_handle, stbl[0], stbl[1], ['stco']))
+        chunk_count = struct.unpack('>I', chunk_table[4:8])[0]
+        chunk_offsets = struct.unpack(f'>{chunk_count}I', 
+        chunk_table[8:8 + 4 * chunk_count])
+
+    # Sample sizes (stsz) are either uniform or listed individually.
+    uniform_size, sample_count = struct.unpack('>II', stsz[4:12])
+    if uniform_size != 0:
+        sample_sizes = [uniform_size] * sample_count
+    else:
+        sample_sizes = struct.unpack(f'>{sample_count}I', 
+        stsz[12:12 + 4 * sample_count])
+
+    # Sample durations (stts) are stored as (count, duration) runs.
+    sample_durations = []
+    for entry in range(struct.unpack('>I', stts[4:8])[0]):
+        count, duration = struct.unpack('>II', 
+        stts[8 + 8 * entry:16 + 8 * entry])
+        sample_durations.extend([duration] * count)
+
+    # Samples are grouped into chunks (stsc), and each chunk begins at
+    # an offset listed within stco or co64.
+    stsc_entries = [struct.unpack('>III', stsc[8 + 12 * entry:20 + 12 * entry])
+    for entry in range(struct.unpack('>I', stsc[4:8])[0])]
+    samples = []
+    sample_index = 0
+    elapsed_units = 0
+    for entry_index, (first_chunk, samples_per_chunk, _) in enumerate(
+    stsc_entries):
+        last_chunk = (stsc_entries[entry_index + 1][0] - 1 
+        if entry_index + 1 < len(stsc_entries) else chunk_count)
+        for chunk in range(first_chunk, last_chunk + 1):
+            offset = chunk_offsets[chunk - 1]
+            for _ in range(samples_per_chunk):
+                if sample_index >= sample_count:
+                    break
+                duration = (sample_durations[sample_index] 
+                if sample_index < len(sample_durations) else 0)
+                samples.append((elapsed_units / timescale, 
+                duration / timescale, offset, sample_sizes[sample_index]))
+                offset += sample_sizes[sample_index]
+                elapsed_units += duration
+                sample_index += 1
+    return GPS_TRACK_SAMPLE_FORMATS[sample_format], samples
+
+
+def parse_gpmf_sample(data):
+    '''Retrieves GPS points from a GoPro GPMF sample. Returns a list of
+    (lat, lon, altitude) tuples along with the UTC time of the first point
+    (or None if no GPSU value was found). Points recorded without a 
+    GPS lock are skipped.
+    
+    GPMF data consists of nested key-length-value entries; see
+    https://github.com/gopro/gpmf-parser#klv-design for details.'''
+    gps_points = []
+    gps_times = []
+
+    def walk(start, end):
+        # Each stream has its own SCAL (scale) and GPSF (fix) values, so
+        # these are tracked separately for each nesting level.
+        scale = (1,)
+        gps_fix = None
+        position = start
+        while position + 8 <= end:
+            key = data[position:position + 4].decode('latin-1')
+            value_type = chr(data[position + 4])
+            struct_size = data[position + 5]
+            repeat = struct.unpack('>H', data[position + 6:position + 8])[0]
+            value_start = position + 8
+            value_end = value_start + struct_size * repeat
+            if value_type == '\x00':
+                walk(value_start, value_end)
+            elif (key == 'SCAL') and (value_type in GPMF_STRUCT_FORMATS):
+                value_format = GPMF_STRUCT_FORMATS[value_type]
+                value_count = (value_end - value_start) // struct.calcsize(
+                    value_format)
+                scale = struct.unpack('>' + value_format * value_count,
+                data[value_start:value_start + value_count * struct.calcsize(
+                    value_format)])
+            elif key == 'GPSF':
+                gps_fix = struct.unpack('>I', 
+                data[value_start:value_start + 4])[0]
+            elif key == 'GPSU':
+                gps_times.append(data[value_start:value_end].decode(
+                    'latin-1'))
+            elif key in ('GPS5', 'GPS9') and gps_fix != 0:
+                # GPS5 rows contain 5 int32 values (lat, lon, altitude,
+                # 2D speed, and 3D speed); GPS9 rows (found in newer
+                # cameras) add days, seconds, DOP, and fix values.
+                row_format = '>5i' if key == 'GPS5' else '>7i2H'
+                row_size = struct.calcsize(row_format)
+                for row in range(repeat):
+                    row_start = value_start + row * struct_size
+                    if row_start + row_size > len(data):
+                        break
+                    values = struct.unpack(row_format, 
+                    data[row_start:row_start + row_size])
+                    row_scale = (scale * 3 if len(scale) == 1 
+                    else scale[0:3])
+                    if key == 'GPS9' and values[8] == 0:
+                        continue
+                    gps_points.append((values[0] / row_scale[0],
+                    values[1] / row_scale[1], values[2] / row_scale[2]))
+            position = value_start + ((struct_size * repeat + 3) // 4) * 4
+            # (Values are padded to a multiple of 4 bytes.)
+
+    walk(0, len(data))
+    utc_time = None
+    if len(gps_times) > 0:
+        # GPSU values take the form 'yymmddhhmmss.sss'.
+        utc_time = pd.to_datetime(gps_times[0], format = '%y%m%d%H%M%S.%f',
+        utc = True, errors = 'coerce')
+        if pd.isna(utc_time):
+            utc_time = None
+    return gps_points, utc_time
+
+
+def parse_camm_sample(data):
+    '''Retrieves a GPS point from a CAMM sample. Only types 5 (minimal GPS)
+    and 6 (full GPS) contain coordinates; other types (e.g. gyroscope 
+    readings) return an empty list. See
+    https://developers.google.com/streetview/publish/camm-spec'''
+    if len(data) < 4:
+        return [], None
+    camm_type = struct.unpack('<H', data[2:4])[0]
+    if (camm_type == 5) and (len(data) >= 28):
+        lat, lon, altitude = struct.unpack('<ddd', data[4:28])
+        return [(lat, lon, altitude)], None
+    if (camm_type == 6) and (len(data) >= 36):
+        gps_seconds, fix_type, lat, lon, altitude = struct.unpack(
+            '<dIddf', data[4:36])
+        if fix_type == 0:
+            return [], None
+        # time_gps_epoch is measured in seconds since the start of the
+        # GPS epoch (1980-01-06), which is currently 18 leap seconds 
+        # ahead of UTC.
+        utc_time = pd.Timestamp('1980-01-06', tz = 'UTC') + pd.Timedelta(
+            seconds = gps_seconds - 18)
+        return [(lat, lon, altitude)], utc_time
+    return [], None
+
+
+def parse_nmea_sample(data):
+    '''Retrieves GPS points from a text sample containing NMEA sentences
+    (e.g. '$GPRMC,...'). Only RMC and GGA sentences are used.'''
+    text = data.decode('latin-1', errors = 'ignore')
+    gps_points = []
+    utc_time = None
+    for sentence_type, fields in NMEA_SENTENCE_PATTERN.findall(text):
+        fields = fields.split(',')
+        try:
+            if sentence_type == 'RMC':
+                # RMC fields: time, status, lat, N/S, lon, E/W, speed,
+                # course, date (ddmmyy), ...
+                if fields[1] != 'A': # 'V' means that no fix was available.
+                    continue
+                lat_text, lat_ref, lon_text, lon_ref = fields[2:6]
+                altitude = np.nan
+                if (utc_time is None) and len(fields[8]) == 6:
+                    utc_time = pd.to_datetime(fields[8] + fields[0], 
+                    format = '%d%m%y%H%M%S.%f' if '.' in fields[0] 
+                    else '%d%m%y%H%M%S', utc = True, errors = 'coerce')
+                    if pd.isna(utc_time):
+                        utc_time = None
+            else:
+                # GGA fields: time, lat, N/S, lon, E/W, fix quality, 
+                # satellites, HDOP, altitude, ...
+                if fields[5] in ('', '0'):
+                    continue
+                lat_text, lat_ref, lon_text, lon_ref = fields[1:5]
+                altitude = float(fields[8]) if fields[8] != '' else np.nan
+            # NMEA coordinates take the form (d)ddmm.mmmm.
+            lat_value = float(lat_text)
+            lon_value = float(lon_text)
+            lat = (lat_value // 100) + (lat_value % 100) / 60
+            lon = (lon_value // 100) + (lon_value % 100) / 60
+            if lat_ref == 'S':
+                lat *= -1
+            if lon_ref == 'W':
+                lon *= -1
+            gps_points.append((lat, lon, altitude))
+        except (ValueError, IndexError):
+            continue
+    return gps_points, utc_time
+
+
+GPS_SAMPLE_PARSERS = {'gpmf': parse_gpmf_sample, 'camm': parse_camm_sample,
+'nmea': parse_nmea_sample}
+
+
+def extract_clip_gps_track(path, sample_interval = 1.0, 
+clip_start_time = None):
+    '''Extracts the embedded GPS track (if any) from an MP4/MOV file 
+    without decoding any video frames. Returns a list of dictionaries,
+    each of which represents a single point.
+
+    sample_interval: The minimum number of seconds between retained 
+    points. Samples that fall entirely in between retained points are
+    skipped without being read, so larger intervals also mean less I/O.
+
+    clip_start_time: The UTC time at which the clip began. If this isn't
+    provided, the creation time stored within the file's 'mvhd' box will
+    be used instead. Points whose samples include their own GPS 
+    timestamps will use those timestamps instead.
+
+    Memory use is bounded by the size of the GPS tracks' sample tables
+    (and the downsampled output), not by the size of the file.'''
+    track_points = []
+    with open(path, 'rb') as file_handle:
+        file_size = os.fstat(file_handle.fileno()).st_size
+        moov = find_mp4_box(file_handle, 0, file_size, ['moov'])
+        if moov is None:
+            return track_points
+        if clip_start_time is None:
+            mvhd = read_mp4_box(file_handle, find_mp4_box(
+                file_handle, moov[0], moov[1], ['mvhd']))
+            if mvhd is not None:
+                # Creation times are stored as seconds since 1904-01-01.
+                creation_seconds = (struct.unpack('>Q', mvhd[4:12])[0] 
+                if mvhd[0] == 1 else struct.unpack('>I', mvhd[4:8])[0])
+                if creation_seconds > 0:
+                    clip_start_time = pd.Timestamp(
+                        '1904-01-01', tz = 'UTC') + pd.Timedelta(
+                        seconds = creation_seconds)
+        
+        for box_type, trak_start, trak_end in iterate_mp4_boxes(
+        file_handle, moov[0], moov[1]):
+            if box_type != 'trak':
+                continue
+            sample_table = read_gps_sample_table(
+                file_handle, trak_start, trak_end)
+            if sample_table is None:
+                continue
+            parser_name, samples = sample_table
+            sample_parser = GPS_SAMPLE_PARSERS[parser_name]
+            next_point_time = 0.0
+            for sample_start, sample_duration, offset, size in samples:
+                if sample_start + sample_duration < next_point_time:
+                    continue
+                file_handle.seek(offset)
+                gps_points, sample_utc_time = sample_parser(
+                    file_handle.read(size))
+                for point_index, (lat, lon, altitude) in enumerate(
+                gps_points):
+                    # Points within a sample are assumed to be evenly
+                    # spaced across that sample's duration.
+                    point_offset = (sample_duration * point_index 
+                    / len(gps_points))
+                    track_time = sample_start + point_offset
+                    if track_time < next_point_time:
+                        continue
+                    if (lat == 0) and (lon == 0):
+                        continue
+                    if sample_utc_time is not None:
+                        utc_time = sample_utc_time + pd.Timedelta(
+                            seconds = point_offset)
+                    elif clip_start_time is not None:
+                        utc_time = clip_start_time + pd.Timedelta(
+                            seconds = track_time)
+                    else:
+                        utc_time = pd.NaT
+                    track_points.append({'track_time': track_time,
+                    'utc_metadata_creation_time': utc_time, 'lat': lat,
+                    'lon': lon, 'altitude': altitude, 
+                    'track_source': parser_name})
+                    next_point_time = track_time + sample_interval
+            if len(track_points) > 0:
+                # Some cameras store the same track in multiple formats;
+                # the first one found is sufficient.
+                break
+    return track_points
+
+
+def retrieve_clip_gps_tracks(df_clips, folder_name = None, 
+sample_interval = 1.0):
+    '''This function retrieves embedded per-second GPS tracks (see
+    extract_clip_gps_track) for each clip within df_clips, which should
+    be formatted like the DataFrames returned by generate_media_list or
+    retrieve_clip_locations. 
+
+    The resulting DataFrame has one row per retained track point and 
+    includes path, name, lat, lon, and utc_metadata_creation_time columns.
+    It can therefore be passed to map_media_locations (with 
+    add_paths = True) to show the full route covered by each clip, or 
+    combined with a location DataFrame via pd.concat.
+
+    If folder_name is provided, the output will also be saved as 
+    f'{folder_name}_clip_tracks.csv'.
+
+    Note: Only MP4/MOV files are supported. Timed GPS tracks are read from
+    GoPro GPMF ('gpmd'), CAMM, and NMEA text tracks. Clips that only store
+    a single location within their metadata (e.g. an ISO 6709 'location' 
+    tag, as many phones write) have no such track, so no track points will
+    be returned for them.
+    '''
+    from tqdm import tqdm
+    track_dict_list = []
+    has_clip_times = 'utc_metadata_creation_time' in df_clips.columns
+    for i in tqdm(range(len(df_clips))):
+        path = df_clips.iloc[i]['path']
+        clip_start_time = None
+        if has_clip_times and pd.notna(
+        df_clips.iloc[i]['utc_metadata_creation_time']):
+            clip_start_time = df_clips.iloc[i]['utc_metadata_creation_time']
+        try:
+            track_points = extract_clip_gps_track(path, 
+            sample_interval = sample_interval, 
+            clip_start_time = clip_start_time)
+        except:
+            continue
+        for track_point in track_points:
+            track_point['path'] = path
+            track_point['name'] = df_clips.iloc[i]['name']
+            track_point['type'] = 'clip_track'
+        track_dict_list.extend(track_points)
+
+    df_tracks = pd.DataFrame(track_dict_list, columns = ['path', 'name', 
+    'type', 'track_time', 'utc_metadata_creation_time', 'lat', 'lon', 
+    'altitude', 'track_source'])
+    df_tracks['utc_metadata_creation_time'] = pd.to_datetime(
+        df_tracks['utc_metadata_creation_time'], utc = True)
+    if folder_name is not None:
+        df_tracks.to_csv(f'{folder_name}_clip_tracks.csv', index = False)
+    return df_tracks
+
+
+def load_location_list(folder_name):
+    '''Reads the location list saved by generate_loc_list (e.g. 
+    f'{folder_name}_media_locations.csv') and converts its date/time 
+    columns back into UTC DateTimes.'''
+    df_locations = pd.read_csv(f'{folder_name}_media_locations.csv')
+    for col in ['utc_ctime_estimate', 'utc_modified_time_estimate',
+                'utc_accessed_time_estimate', 'utc_metadata_creation_time']:
+        if col in df_locations.columns:
+            df_locations[col] = pd.to_datetime(df_locations[col], utc=True,
+            format='mixed')
+    return df_locations
+
+
+def process_new_media(new_paths, folder_name, path_to_map_folder,
+screenshot_save_path = None, region_dict = None, map_kwargs = None,
+timestamp_column = 'utc_metadata_creation_time'):
+    '''This function adds a set of newly copied files to an existing media
+    list and location list (both of which must already exist), then 
+    regenerates only the maps affected by those files.
+
+    new_paths: A list of full paths to the new files. Paths that 
+    already appear within the media list will be skipped.
+
+    path_to_map_folder: The folder in which maps will be saved.
+
+    screenshot_save_path: If provided, screenshots of the regenerated
+    maps (and only those maps) will be saved within this folder via
+    create_map_screenshot.
+
+    region_dict: An optional dictionary whose keys are map names and whose
+    values are (south, north, west, east) bounding boxes, e.g.
+    {'colorado': (37, 41, -109, -102)}. A region's map will be regenerated
+    if any new geotags fall within its bounding box.
+
+    map_kwargs: An optional dictionary of additional arguments (e.g. 
+    zoom_start) to pass to map_media_locations.
+
+    The following maps are regenerated when new geotags are found:
+    'combined' and 'combined_routes' (which show all geotags); 
+    f'{year}_combined' for each year in which a new geotag was created;
+    and any affected regions. These names match the ones used within the
+    tutorial notebook.
+
+    Returns a list of the names of the maps that were regenerated.
+    '''
+    if map_kwargs is None:
+        map_kwargs = {}
+    if region_dict is None:
+        region_dict = {}
+    df_media = pd.read_csv(f'{folder_name}_media_list.csv')
+    known_paths = set(df_media['path'])
+    new_media_dict_list = []
+    for path in new_paths:
+        if path in known_paths:
+            continue
+        try:
+            new_media_dict_list.append(retrieve_file_info(
+                os.path.dirname(path), os.path.basename(path)))
+        except OSError: # The file may have been moved or deleted since
+            # it was detected.
+            continue
+    if len(new_media_dict_list) == 0:
+        return []
+    df_new_media = pd.DataFrame(new_media_dict_list)
+    print(f"Processing {len(df_new_media)} new file(s):")
+    pd.concat([df_media, df_new_media]).to_csv(
+        f'{folder_name}_media_list.csv', index = False)
+
+    # Retrieving locations for the new files only, then appending them
+    # to the stored location list.
+    df_new_locations = generate_loc_list(df_new_media, folder_name, 
+    save_output = False)
+    df_all_locations = pd.concat([load_location_list(folder_name),
+    df_new_locations])
+    # (If the stored list was empty, its columns will have been read in
+    # with an object dtype, so lat and lon are converted back to numbers.)
+    df_all_locations['lat'] = pd.to_numeric(df_all_locations['lat'])
+    df_all_locations['lon'] = pd.to_numeric(df_all_locations['lon'])
+    df_all_locations.to_csv(f'{folder_name}_media_locations.csv', 
+    index = False)
+
+    # Determining which time and region partitions were affected:
+    df_new_valid = df_new_locations[(df_new_locations['lat'] != 0) 
+    & (df_new_locations['lon'] != 0) 
+    & (df_new_locations[timestamp_column].notna())]
+    if len(df_new_valid) == 0:
+        print("None of the new files contained geotags.")
+        return []
+    location_index = MediaLocationIndex(df_all_locations, 
+    timestamp_column = timestamp_column)
+    maps_to_update = {
+        'combined': (location_index.time_range(), False),
+        'combined_routes': (location_index.time_range(), True)}
+    for year in sorted(df_new_valid[timestamp_column].dt.year.unique()):
+        maps_to_update[f'{year}_combined'] = (location_index.year(year), True)
+    for region_name, (south, north, west, east) in region_dict.items():
+        in_longitude_range = (((df_new_valid['lon'] >= west) 
+        & (df_new_valid['lon'] <= east)) if west <= east else (
+            (df_new_valid['lon'] >= west) | (df_new_valid['lon'] <= east)))
+        # (A west value greater than the east value indicates that the
+        # region crosses the antimeridian.)
+        if ((df_new_valid['lat'] >= south) & (df_new_valid['lat'] <= north)
+        & in_longitude_range).any():
+            df_region = location_index.bounding_box(south, north, west, east)
+            maps_to_update[region_name] = (df_region[
+                df_region[timestamp_column].notna()], True)
+
+    for map_name, (df_map_locations, add_paths) in maps_to_update.items():
+        print(f"Updating {map_name}:")
+        map_media_locations(df_map_locations, file_name = map_name,
+        folder_path = path_to_map_folder, add_paths = add_paths,
+        timestamp_column_name = timestamp_column, **map_kwargs)
+        if screenshot_save_path is not None:
+            create_map_screenshot(os.path.abspath(path_to_map_folder),
+            map_name = f'{map_name}_locations.html', 
+            screenshot_save_path = screenshot_save_path)
+    return list(maps_to_update)
+
+
+def watch_media_folders(top_folder_list, folder_name, path_to_map_folder,
+screenshot_save_path = None, region_dict = None, map_kwargs = None,
+use_inotify = True, poll_interval = 30, debounce_seconds = 60, 
+max_updates = None):
+    '''This function watches the folders within top_folder_list for new
+    media files. Once new files stop arriving for debounce_seconds, it
+    passes them to process_new_media, which extracts their geotags, 
+    appends them to the stored location list, and regenerates only the
+    maps (and screenshots) that they affect. If no media list exists yet 
+    for folder_name, one will be generated from scratch first.
+
+    use_inotify: If True, the function will use the inotify_simple library
+    (installed via 'pip install inotify_simple'; Linux only) to receive 
+    file system events. If that library isn't available, or if 
+    use_inotify is False, the function will instead rescan the folders 
+    every poll_interval seconds. Polling is necessary for network mounts
+    (such as the sshfs mount within the tutorial notebook), since inotify
+    doesn't receive events for changes made on other machines.
+
+    debounce_seconds: The number of seconds that must pass without any
+    new (or still-growing) files before an update begins. This prevents
+    the function from processing a phone dump while it's still being 
+    copied.
+
+    max_updates: The number of updates to run before returning. Set to
+    None (the default) to keep watching until the process is interrupted
+    (e.g. via Ctrl+C).
+
+    See process_new_media for explanations of the other arguments.
+    '''
+    if not os.path.exists(f'{folder_name}_media_list.csv'):
+        print("No media list was found, so a new one will be created.")
+        df_media = generate_media_list(top_folder_list, folder_name)
+        generate_loc_list(df_media, folder_name)
+    known_paths = set(pd.read_csv(f'{folder_name}_media_list.csv', 
+    usecols = ['path'])['path'])
+
+    def rescan():
+        '''Returns all files within top_folder_list that aren't in 
+        known_paths. When inotify is in use, every folder is also 
+        (re)watched; adding a watch to a folder that's already watched
+        simply returns its existing watch descriptor.'''
+        unknown_paths = []
+        for top_folder in top_folder_list:
+            for root, dirs, files in os.walk(top_folder):
+                if inotify is not None:
+                    watched_folders[inotify.add_watch(
+                        root, watch_flags)] = root
+                unknown_paths.extend(join(root, file) for file in files
+                if join(root, file) not in known_paths)
+        return unknown_paths
+
+    inotify = None
+    startup_paths = []
+    if use_inotify == True:
+        try:
+            from inotify_simple import INotify, flags
+            # See https://inotify-simple.readthedocs.io/
+            inotify = INotify()
+            watch_flags = flags.CREATE | flags.CLOSE_WRITE | flags.MOVED_TO
+            watched_folders = {}
+            # Besides adding the watches, this initial scan picks up any
+            # files that were copied while the watcher wasn't running. 
+            # (inotify only reports new events, whereas polling mode
+            # picks these files up during its first scan.)
+            startup_paths = rescan()
+        except (ImportError, OSError) as e:
+            print(f"Unable to use inotify ({e}); polling instead.")
+            # If the initial scan failed partway through (e.g. because 
+            # the system's watch limit was reached), the inotify instance
+            # needs to be closed so that its file descriptor (and any
+            # watches that were already added) get released.
+            if inotify is not None:
+                inotify.close()
+            inotify = None
+            startup_paths = []
+
+    pending_sizes = {} # Maps each pending file to its last known size
+    last_change_time = time.time()
+    update_count = 0
+    print("Watching for new media files. Press Ctrl+C to stop.")
+    try:
+        while (max_updates is None) or (update_count < max_updates):
+            candidate_paths = startup_paths
+            startup_paths = []
+            if inotify is not None:
+                rescan_needed = False
+                for event in inotify.read(timeout = int(
+                    min(poll_interval, debounce_seconds) * 1000)):
+                    if (event.mask & flags.Q_OVERFLOW) or (
+                        event.wd not in watched_folders):
+                        # The kernel's event queue overflowed (which can
+                        # happen when a large phone dump is copied while
+                        # process_new_media is running), so some events 
+                        # were lost. (Overflow events have a watch 
+                        # descriptor of -1.) A full rescan will find any
+                        # files that were missed.
+                        rescan_needed = True
+                        continue
+                    path = join(watched_folders[event.wd], event.name)
+                    if event.mask & flags.ISDIR:
+                        # Watching any newly created folders (and picking
+                        # up files that were copied into them before the
+                        # watch was added):
+                        for root, dirs, files in os.walk(path):
+                            watched_folders[inotify.add_watch(
+                                root, watch_flags)] = root
+                            candidate_paths.extend(
+                                join(root, file) for file in files)
+                    else:
+                        candidate_paths.append(path)
+                if rescan_needed == True:
+                    print("Some file system events were missed; rescanning \
+the watched folders.")
+                    candidate_paths.extend(rescan())
+                # Rechecking the sizes of files that are still pending:
+                candidate_paths.extend(pending_sizes)
+            else:
+                candidate_paths.extend(rescan())
+
+            for path in candidate_paths:
+                if path in known_paths:
+                    continue
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    pending_sizes.pop(path, None)
+                    continue
+                if pending_sizes.get(path) != size:
+                    pending_sizes[path] = size
+                    last_change_time = time.time()
+
+            if (len(pending_sizes) > 0) and (
+            time.time() - last_change_time >= debounce_seconds):
+                new_paths = sorted(pending_sizes)
+                process_new_media(new_paths, folder_name, 
+                path_to_map_folder, 
+                screenshot_save_path = screenshot_save_path,
+                region_dict = region_dict, map_kwargs = map_kwargs)
+                known_paths.update(new_paths)
+                pending_sizes = {}
+                update_count += 1
+            elif inotify is None:
+                time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        print("Stopped watching for new media files.")
+    finally:
+        if inotify is not None:
+            inotify.close()
+
+
+def get_shard_name(folder_name, shard_index, shard_count):
+    '''Returns the prefix used for a shard's output files.'''
+    return f'{folder_name}_shard_{shard_index}_of_{shard_count}'
+
+
+def run_extraction_shard(top_folder_list, folder_name, shard_index, 
+shard_count, shard_by = 'directory', files_to_import = 0):
+    '''This function runs generate_media_list and generate_loc_list on a
+    single shard of the folders within top_folder_list. By running each 
+    shard (from 0 to shard_count - 1) within a separate process or on a
+    separate computer, a large archive can be processed in parallel; 
+    merge_extraction_shards can then combine the results.
+
+    Each shard saves three files (whose names begin with the output of 
+    get_shard_name):
+    1. A media list, with a 'media_order' column showing each file's 
+    position within the full media list;
+    2. A location list, which also includes a 'media_order' column; and
+    3. A manifest (.json) file that describes the shard, including the
+    arguments passed to this function. The manifest is written last, so
+    a shard without a manifest should be considered incomplete.
+
+    All shards must be run with the same top_folder_list, shard_count,
+    shard_by, and files_to_import values. (top_folder_list entries can
+    point to different mount locations on different computers, as long as
+    they're listed in the same order and each one contains the same 
+    folder and file names on every computer. File positions are based on
+    these sorted names, so they don't depend on how each computer's file
+    system happens to order its folders.)
+
+    Returns the shard's manifest as a dictionary.
+    '''
+    shard_name = get_shard_name(folder_name, shard_index, shard_count)
+    start_time = time.time()
+    df_media = generate_media_list(top_folder_list, shard_name,
+    files_to_import = files_to_import, shard_index = shard_index,
+    shard_count = shard_count, shard_by = shard_by)
+    if len(df_media) > 0:
+        df_locations = generate_loc_list(df_media, shard_name, 
+        save_output = False)
+    else: # This shard didn't contain any files.
+        df_locations = pd.DataFrame()
+    df_locations.to_csv(f'{shard_name}_media_locations.csv', 
+    index_label = 'media_order')
+
+    manifest = {'folder_name': folder_name, 'shard_index': shard_index,
+    'shard_count': shard_count, 'shard_by': shard_by, 
+    'top_folder_list': list(top_folder_list), 
+    'files_to_import': files_to_import,
+    'media_list_file': f'{shard_name}_media_list.csv',
+    'media_locations_file': f'{shard_name}_media_locations.csv',
+    'file_count': len(df_media), 'location_count': len(df_locations),
+    'host': socket.gethostname(), 
+    'completed_utc': pd.Timestamp.now(tz = 'UTC').isoformat(),
+    'run_seconds': round(time.time() - start_time, 2)}
+    with open(f'{shard_name}_manifest.json', 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent = 4)
+    return manifest
+
+
+def merge_extraction_shards(folder_name, shard_folder = '.'):
+    '''This function combines the output of the run_extraction_shard calls
+    for folder_name (which should all be stored within shard_folder) into
+    f'{folder_name}_media_list.csv' and 
+    f'{folder_name}_media_locations.csv'. These files will be identical
+    to the ones that generate_media_list and generate_loc_list would have
+    created within a single process: rows are put back into their original
+    order (pictures first, then clips, as in generate_loc_list), and any 
+    duplicate paths are removed.
+
+    Shard CSVs are read as text (rather than being converted into numbers
+    and dates) so that their values are written back out unchanged.
+
+    A ValueError is raised if any shards are missing or if the shards
+    were created with different arguments. Returns the merged location 
+    list (via load_location_list).
+    '''
+    manifest_paths = sorted(glob.glob(os.path.join(shard_folder, 
+    glob.escape(folder_name) + '_shard_*_of_*_manifest.json')))
+    if len(manifest_paths) == 0:
+        raise FileNotFoundError(f"No shard manifests were found for \
+{folder_name} within {shard_folder}.")
+    manifests = []
+    for manifest_path in manifest_paths:
+        with open(manifest_path) as manifest_file:
+            manifests.append(json.load(manifest_file))
+
+    for key in ['shard_count', 'shard_by', 'files_to_import']:
+        values = set(manifest[key] for manifest in manifests)
+        if len(values) > 1:
+            raise ValueError(f"Shards for {folder_name} were created with \
+different {key} values: {values}")
+    # The top folder paths themselves may differ from one computer to the
+    # next, but each shard's top_folder_list needs to have the same 
+    # number of entries (since each entry's position is used within
+    # assign_shard).
+    top_folder_counts = set(len(manifest['top_folder_list']) 
+    for manifest in manifests)
+    if len(top_folder_counts) > 1:
+        raise ValueError(f"Shards for {folder_name} were created with \
+top_folder_list values of different lengths: {top_folder_counts}")
+    shard_count = manifests[0]['shard_count']
+    found_shards = sorted(manifest['shard_index'] for manifest in manifests)
+    if found_shards != list(range(shard_count)):
+        missing_shards = sorted(set(range(shard_count)) - set(found_shards))
+        raise ValueError(f"Expected shards 0 to {shard_count - 1} for \
+{folder_name}, but shard(s) {missing_shards} are missing (or duplicated).")
+
+    for list_type in ['media_list', 'media_locations']:
+        df_shard_list = [pd.read_csv(os.path.join(shard_folder, 
+            manifest[f'{list_type}_file']), dtype = str, 
+            keep_default_na = False) for manifest in sorted(
+            manifests, key = lambda manifest: manifest['shard_index'])]
+        # Shards without any files will only contain a media_order column,
+        # so the column order is taken from the first non-empty shard.
+        columns = next((df_shard.columns for df_shard in df_shard_list 
+        if len(df_shard.columns) > 1), df_shard_list[0].columns)
+        df_merged = pd.concat(df_shard_list, ignore_index = True)[columns]
+        df_merged['media_order'] = df_merged['media_order'].astype(int)
+        df_merged = df_merged.sort_values('media_order', 
+        kind = 'stable').drop_duplicates(subset = 'path', keep = 'first')
+        if list_type == 'media_locations':
+            df_merged = pd.concat([df_merged[df_merged['type'] == 'pic'],
+            df_merged[df_merged['type'] == 'clip']])
+        df_merged.drop(columns = 'media_order').to_csv(
+            f'{folder_name}_{list_type}.csv', index = False)
+    print(f"Merged {shard_count} shards into {folder_name}_media_list.csv \
+and {folder_name}_media_locations.csv.")
+    return load_location_list(folder_name)
+
+
+def run_sharded_extraction(top_folder_list, folder_name, shard_count, 
+processes = None, shard_by = 'directory', files_to_import = 0):
+    '''This function runs each shard of an extraction (see 
+    run_extraction_shard) within its own process on the current computer,
+    then merges the results via merge_extraction_shards. It's a convenient
+    way to speed up extraction on a multi-core computer--and to test out
+    sharded extraction before spreading shards across several machines.
+
+    processes: The number of worker processes to use. Defaults to 
+    shard_count.
+
+    Note: On Windows and macOS, scripts that call this function must do so
+    within an 'if __name__ == "__main__":' block.
+    '''
+    import multiprocessing
+    with multiprocessing.Pool(processes = processes or shard_count) as pool:
+        pool.starmap(run_extraction_shard, [(top_folder_list, folder_name,
+        shard_index, shard_count, shard_by, files_to_import) 
+        for shard_index in range(shard_count)])
+    # See https://docs.python.org/3/library/multiprocessing.html
+    return merge_extraction_shards(folder_name)